@@ -0,0 +1,46 @@
+# demo/bench_latency.py
+
+import sys
+import os
+
+
+# 将 src 目录添加到 sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+
+import tempfile
+import time
+
+import epkits as ep
+
+
+def quick_size() -> int:
+    try:
+        return os.path.getsize(os.path.join("log", "ep.quick.log"))
+    except OSError:
+        return 0
+
+
+if __name__ == "__main__":
+    # 在临时目录中运行, 不污染当前目录的 ./log
+    os.chdir(tempfile.mkdtemp())
+    os.makedirs("log")
+
+    ep.enable_debug()
+    ep.init()
+
+    n = 200
+    latencies = []
+    for i in range(n):
+        size = quick_size()
+        start = time.perf_counter()
+        ep.logger.test(f"快速通道延迟测试 {i}")
+        while quick_size() == size:
+            pass
+        latencies.append((time.perf_counter() - start) * 1000)
+        time.sleep(0.01)
+
+    latencies.sort()
+    print(
+        f"快速通道延迟: 中位数 {latencies[n // 2]:.3f}ms, "
+        f"p99 {latencies[n * 99 // 100]:.3f}ms, 最大 {latencies[-1]:.3f}ms"
+    )
@@ -0,0 +1,82 @@
+# demo/bench_record.py
+
+import sys
+import os
+
+
+# 将 src 目录添加到 sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+
+import time
+import tracemalloc
+from dataclasses import dataclass
+from typing import Any, Callable
+
+import epkits as ep
+
+
+@dataclass
+class legacy_record_t:
+    """旧的 record_t, 每条记录带 __dict__, 用于对比"""
+
+    ts: float = 0
+    seq: int = 0
+    level: int = ep.level_t.N
+    nid: int = 0
+    nname: str = ""
+    pid: int = -1
+    pname: str = ""
+    tid: int = -1
+    tname: str = ""
+    file: str = ""
+    lineno: int = -1
+    func: str = ""
+    message: str = ""
+
+
+def make_legacy(i: int, context: ep.context_t, site: ep.callsite_t) -> legacy_record_t:
+    return legacy_record_t(
+        ts=time.time(),
+        seq=i,
+        level=ep.level_t.I,
+        nid=context.nid,
+        nname=context.nname,
+        pid=context.pid,
+        pname=context.pname,
+        tid=context.tid,
+        tname=context.tname,
+        file=site.file,
+        lineno=i,
+        func=site.func,
+        message="测试日志",
+    )
+
+
+def make_record(i: int, context: ep.context_t, site: ep.callsite_t) -> ep.record_t:
+    return ep.record_t(
+        ts=time.time(),
+        seq=i,
+        level=ep.level_t.I,
+        context=context,
+        site=site,
+        lineno=i,
+        message="测试日志",
+    )
+
+
+def measure(make: Callable[[int, ep.context_t, ep.callsite_t], Any], n: int) -> int:
+    context = ep.get_context()
+    site = ep.get_callsite(measure.__code__)
+    tracemalloc.start()
+    records = [make(i, context, site) for i in range(n)]
+    size, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del records
+    return size
+
+
+if __name__ == "__main__":
+    n = 1000 * 1000
+    for name, make in (("legacy", make_legacy), ("record_t", make_record)):
+        size = measure(make, n)
+        print(f"{name:10s} {n} 条记录: {size / 1024 / 1024:8.1f}MB, 每条 {size / n:6.1f}B")
@@ -0,0 +1,80 @@
+# demo/bench_seq.py
+
+import sys
+import os
+
+
+# 将 src 目录添加到 sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+
+import tempfile
+import threading
+import time
+
+import epkits as ep
+
+
+class lock_seq_t:
+    """旧的加锁实现, 用于对比"""
+
+    def __init__(self) -> None:
+        self.seq = 0
+        self.seq_lock = threading.Lock()
+
+    def get_seq(self, level: ep.level_t) -> int:
+        if level < ep.get_level():
+            return 0
+
+        with self.seq_lock:
+            self.seq += 1
+
+        return self.seq
+
+
+class shared_seq_t:
+    """跨进程序号, block 为每次加文件锁预留的个数"""
+
+    def __init__(self, block: int) -> None:
+        path = os.path.join(tempfile.mkdtemp(), "ep.seq")
+        self.seq_counter = ep.shared_seq_t(path, block)
+
+    def get_seq(self, level: ep.level_t) -> int:
+        if level < ep.get_level():
+            return 0
+
+        return next(self.seq_counter)
+
+
+def run(get_seq, m: int, n: int) -> float:
+    barrier = threading.Barrier(m + 1)
+
+    def worker() -> None:
+        barrier.wait()
+        for i in range(n):
+            get_seq(ep.level_t.I)
+
+    threads = [threading.Thread(target=worker, daemon=True) for i in range(m)]
+    for t in threads:
+        t.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for t in threads:
+        t.join()
+    end = time.perf_counter()
+    return end - start
+
+
+if __name__ == "__main__":
+    total = 640000
+    for m in (1, 2, 4, 8, 16, 32, 64):
+        n = total // m
+        lock_s = run(lock_seq_t().get_seq, m, n)
+        count_s = run(ep.logger.get_seq, m, n)
+        shared_s = run(shared_seq_t(1024).get_seq, m, n)
+        strict_s = run(shared_seq_t(1).get_seq, m, n)
+        print(
+            f"线程数: {m:3d}, 加锁: {lock_s / total * 1_000_000_000:8.1f}ns/次, "
+            f"无锁: {count_s / total * 1_000_000_000:8.1f}ns/次, "
+            f"跨进程 (块 1024): {shared_s / total * 1_000_000_000:8.1f}ns/次, "
+            f"跨进程 (块 1): {strict_s / total * 1_000_000_000:8.1f}ns/次"
+        )
@@ -0,0 +1,63 @@
+# demo/bench_threads.py
+
+import sys
+import os
+
+
+# 将 src 目录添加到 sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+
+import tempfile
+import threading
+import time
+
+import epkits as ep
+
+
+def pending() -> bool:
+    if not ep.logger_server.log_queue.empty():
+        return True
+    return any(buffer for thread, buffer in ep.logger_server.local_buffers)
+
+
+def run(m: int, n: int) -> float:
+    """m 个线程各写 n 条日志, 返回生产者的总耗时"""
+    barrier = threading.Barrier(m + 1)
+
+    def worker() -> None:
+        barrier.wait()
+        for i in range(n):
+            ep.logger.info("测试日志 %d", i)
+
+    threads = [threading.Thread(target=worker, daemon=True) for i in range(m)]
+    for t in threads:
+        t.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for t in threads:
+        t.join()
+    end = time.perf_counter()
+
+    # 等写日志线程写完, 不影响下一轮
+    while pending():
+        time.sleep(0.01)
+    return end - start
+
+
+if __name__ == "__main__":
+    # 在临时目录中运行, 不污染当前目录的 ./log
+    os.chdir(tempfile.mkdtemp())
+    os.makedirs("log")
+    ep.init()
+
+    total = 320000
+    for m in (1, 2, 4, 8, 16, 32, 64):
+        n = total // m
+        ep.logger_server.local_mode = False
+        queue_s = run(m, n)
+        ep.logger_server.local_mode = True
+        local_s = run(m, n)
+        print(
+            f"线程数: {m:3d}, queue.Queue: {queue_s / total * 1_000_000:6.2f}μs/条, "
+            f"线程本地缓冲: {local_s / total * 1_000_000:6.2f}μs/条"
+        )
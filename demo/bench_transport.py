@@ -0,0 +1,72 @@
+# demo/bench_transport.py
+
+import sys
+import os
+
+
+# 将 src 目录添加到 sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+
+import multiprocessing
+import tempfile
+import time
+
+import epkits as ep
+
+
+def producer(transport: str, n: int) -> None:
+    ep.logger_server.transport = transport
+    ep.init()
+    for i in range(n):
+        ep.logger.info("测试日志 %d", i)
+
+
+def run(transport: str, m: int, n: int) -> tuple[float, float, int]:
+    """m 个进程各写 n 条日志, 返回 (生产者的总耗时, 本进程收到最后一条记录的耗时, 收到的条数)
+
+    生产者退出时最多用 1 秒发送剩余的记录, 超时的部分会丢失, 所以按收到的条数计算吞吐量
+    """
+    received = 0
+    last = 0.0
+
+    def count(record: ep.record_t) -> None:
+        nonlocal received, last
+        received += 1
+        last = time.perf_counter()
+
+    sink = ep.callable_sink_t(count, level=ep.level_t.I, maxsize=m * n)
+    ep.logger_server.add_sink(sink)
+
+    processes = [
+        multiprocessing.Process(target=producer, args=(transport, n)) for i in range(m)
+    ]
+    start = time.perf_counter()
+    for p in processes:
+        p.start()
+    for p in processes:
+        p.join()
+    produced = time.perf_counter() - start
+
+    # 2 秒没有新记录就认为收完了
+    while received < m * n and time.perf_counter() - max(last, start) < 2:
+        time.sleep(0.01)
+    ep.logger_server.remove_sink(sink)
+    return produced, last - start, received
+
+
+if __name__ == "__main__":
+    # 在临时目录中运行, 不污染当前目录的 ./log
+    multiprocessing.set_start_method("spawn")
+    os.chdir(tempfile.mkdtemp())
+    os.makedirs("log")
+    ep.init()
+
+    total = 200000
+    for m in (1, 2, 4, 8):
+        n = total // m
+        for transport in ("socket", "shm"):
+            produced, done, received = run(transport, m, n)
+            print(
+                f"进程数: {m}, {transport:6s}: 生产者 {produced:5.2f}s, 收到 {received} 条 "
+                f"{done:5.2f}s, {received / done:8.0f} 条/秒"
+            )
@@ -9,6 +9,9 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "s
 
 import threading
 import time
+import multiprocessing
+import pathlib
+from dataclasses import dataclass
 
 
 import epkits as ep
@@ -35,7 +38,78 @@ def worker(n: int):
         time.sleep(0.001)
 
 
+@dataclass
+class legacy_record_t:
+    """旧的 record_t, 用于对比"""
+
+    ts: float = 0
+    seq: int = 0
+    level: int = ep.level_t.N
+    nid: int = 0
+    nname: str = ""
+    pid: int = -1
+    pname: str = ""
+    tid: int = -1
+    tname: str = ""
+    file: str = ""
+    lineno: int = -1
+    func: str = ""
+    message: str = ""
+
+
+def legacy_info(message: str = "", *, back: int = 0) -> None:
+    """旧的 logger.info 实现: 先构造一次记录, rawlog 中再构造一次 record_t, 用于对比"""
+    seq = ep.logger.get_seq(ep.level_t.I)
+    if seq == 0:
+        return
+
+    frame = ep.get_frame(back + 1)
+
+    record = legacy_record_t(
+        ts=time.time(),
+        seq=seq,
+        level=ep.level_t.I,
+        nid=ep.logger.nid,
+        nname=ep.logger.nname,
+        pid=os.getpid(),
+        pname=multiprocessing.current_process().name,
+        tid=threading.get_ident(),
+        tname=threading.current_thread().name,
+        file="",
+        lineno=0,
+        func="",
+        message=message,
+    )
+
+    if frame:
+        record.file = pathlib.PurePath(frame.f_code.co_filename).as_posix()
+        record.lineno = frame.f_lineno
+        record.func = frame.f_code.co_qualname
+
+    ep.logger.rawlog(**record.__dict__)
+
+
+def drain() -> None:
+    while not ep.logger_server.log_queue.empty():
+        ep.logger_server.log_queue.get_nowait()
+
+
+def bench_emit(n: int = 100000) -> None:
+    """单次调用耗时: 旧实现 vs logger.info"""
+    for name, func in (("legacy", legacy_info), ("logger.info", ep.logger.info)):
+        drain()
+        start = time.perf_counter()
+        for i in range(n):
+            func("测试日志")
+        end = time.perf_counter()
+        print(f"{name:12s} 平均耗时: {(end - start) / n * 1_000_000:.03f}μs")
+    drain()
+
+
 if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "bench":
+        bench_emit()
+        sys.exit(0)
 
     n = 1000
     m = 16
@@ -8,7 +8,19 @@ from .core import *
 from .zero import *
 
 from .level import *
+from .location import *
+from .policy import *
+from .sync import *
+from .callsite import *
+from .context import *
 from .record import *
+from .segment import *
+from .sink import *
+from .binary import *
+from .index import *
+from .seq import *
+from .shmring import *
+from .aggregate import *
 from .mlogger import *
 from .logger import *
 from .logger_server import *
@@ -20,19 +32,29 @@ import sys
 import atexit
 
 
+_pid = 0
+
+
 def _deinit() -> None:
-    os.remove("./log/ep.pid")
+    # fork 出的子进程也会执行继承来的 atexit
+    if os.getpid() == _pid:
+        os.remove("./log/ep.pid")
 
 
 def init() -> None:
+    global _pid
     if sys.version_info < (3, 12):
         raise RuntimeError("epkits 需要 Python 3.12 或更高版本")
-    atexit.register(_deinit)
-
-    with open("./log/ep.pid", "w") as f:
-        f.write(str(os.getpid()))
-
     logger_server.init()
+    if logger_server.seq_path is not None:
+        logger.seq_counter = shared_seq_t(logger_server.seq_path, logger_server.seq_block)
+
+    # 转发模式的进程把记录发给持有文件锁的进程, ep.pid 记录的是后者
+    if logger_server.forwarder is None:
+        _pid = os.getpid()
+        atexit.register(_deinit)
+        with open("./log/ep.pid", "w") as f:
+            f.write(str(os.getpid()))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,312 @@
+__all__ = ["aggregate_server_t", "forward_client_t"]
+
+import os
+import socket
+import struct
+import threading
+import time
+from typing import Callable
+
+from .record import record_t
+from .binary import magic, frame_header, iter_frames, binary_encoder_t, binary_decoder_t, FRAME_RECORD
+from .binary import pack_string, unpack_string, FRAME_RESET
+from .shmring import shm_ring_t
+
+# 多进程写同一个日志目录: 持有 ep.lock 的进程在 ep.sock 上接收其他进程的记录,
+# 其他进程把记录编码为二进制帧批量发送. 每个连接以 magic 开头, context 和 site 的字典按连接维护.
+# 共享内存传输: 连接上只发送一个 RING 帧告知共享内存的名字, 记录帧写入共享内存环形缓冲区,
+# 写入时没有系统调用, 接收方轮询读取; 连接断开表示发送方已经退出
+FRAME_RING = 16
+
+# 接收方轮询共享内存的间隔, 空闲时从 ring_poll_min 逐渐加倍到 ring_poll_max
+ring_poll_min = 0.0001
+ring_poll_max = 0.01
+
+
+class aggregate_server_t:
+    """接收其他进程发来的记录, 每个连接一个线程
+
+    path 为字符串时监听 Unix 域套接字, 为 (host, port) 时监听 TCP, 用于 python -m epkits.collector
+    """
+
+    def __init__(self, path: str | tuple[str, int], handle: Callable[[record_t], None]) -> None:
+        self.path = path
+        self.handle = handle
+        self.sock: socket.socket | None = None
+        self.conns: set[socket.socket] = set()
+        self.conns_lock = threading.Lock()
+        # 读共享内存的线程, 停止时等它们取完剩余的记录
+        self.pollers: set[threading.Thread] = set()
+
+    def start(self) -> None:
+        if isinstance(self.path, str):
+            # 调用者持有文件锁, 残留的 socket 文件是上一个持有者没有清理的
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        else:
+            sock = socket.socket(socket.AF_INET6 if ":" in self.path[0] else socket.AF_INET)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+
+        try:
+            sock.bind(self.path)
+            sock.listen(64)
+        except OSError:
+            sock.close()
+            raise
+        self.sock = sock
+        threading.Thread(target=self.accept, args=(sock,), name="epaggr", daemon=True).start()
+
+    def stop(self, timeout: float = 1.0) -> None:
+        sock = self.sock
+        if sock is None:
+            return
+        self.sock = None
+        try:
+            # 只 close 不能唤醒阻塞在 accept 上的线程
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        sock.close()
+        if isinstance(self.path, str):
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+        with self.conns_lock:
+            conns = list(self.conns)
+        for conn in conns:
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+        deadline = time.monotonic() + timeout
+        with self.conns_lock:
+            pollers = list(self.pollers)
+        for poller in pollers:
+            poller.join(max(0.0, deadline - time.monotonic()))
+
+    def abandon(self) -> None:
+        """fork 之后在子进程中调用, 只关闭继承来的描述符, 不 shutdown, 不删除 socket 文件, 父进程照常接收"""
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+        for conn in self.conns:
+            conn.close()
+        self.conns = set()
+        self.conns_lock = threading.Lock()
+        self.pollers = set()
+
+    def accept(self, sock: socket.socket) -> None:
+        while True:
+            try:
+                conn, addr = sock.accept()
+            except OSError:
+                break
+            with self.conns_lock:
+                self.conns.add(conn)
+            threading.Thread(
+                target=self.receive, args=(conn,), name="epaggr.conn", daemon=True
+            ).start()
+
+    def receive(self, conn: socket.socket) -> None:
+        decoder = binary_decoder_t()
+        pending = b""
+        offset = len(magic)
+        stopped: threading.Event | None = None
+        try:
+            while chunk := conn.recv(1024 * 1024):
+                data = pending + chunk
+                if len(data) < offset:
+                    pending = data
+                    continue
+                if offset and data[: len(magic)] != magic:
+                    break
+
+                end = offset
+                for frame_offset, frame_type, payload in iter_frames(data, offset):
+                    if frame_type == FRAME_RECORD:
+                        self.handle(decoder.decode(payload))
+                    elif frame_type == FRAME_RING and stopped is None and isinstance(self.path, str):
+                        name, pos = unpack_string(payload, 0)
+                        stopped = threading.Event()
+                        poller = threading.Thread(
+                            target=self.poll,
+                            args=(shm_ring_t.attach(name), stopped),
+                            name="epaggr.ring",
+                            daemon=True,
+                        )
+                        with self.conns_lock:
+                            self.pollers.add(poller)
+                        poller.start()
+                    else:
+                        decoder.define(frame_type, payload)
+                    end = frame_offset + frame_header.size + len(payload)
+                # 不完整的帧留到下一次
+                pending = data[end:]
+                offset = 0
+        except OSError:
+            pass
+        except (KeyError, ValueError, struct.error):
+            # 收集器的 TCP 端口可能收到不完整或不是 epkits 的数据, 关闭连接
+            pass
+        finally:
+            if stopped is not None:
+                stopped.set()
+            with self.conns_lock:
+                self.conns.discard(conn)
+            conn.close()
+
+    def poll(self, ring: shm_ring_t, stopped: threading.Event) -> None:
+        """读取共享内存中的记录, 连接断开后取完剩余的记录再退出"""
+        decoder = binary_decoder_t()
+        offset = len(magic)
+        interval = ring_poll_min
+        try:
+            while True:
+                # 写者每次写入完整的帧, 读到的数据中没有不完整的帧
+                data = ring.read()
+                if data:
+                    for frame_offset, frame_type, payload in iter_frames(data, offset):
+                        if frame_type == FRAME_RECORD:
+                            self.handle(decoder.decode(payload))
+                        else:
+                            decoder.define(frame_type, payload)
+                    offset = 0
+                    interval = ring_poll_min
+                    continue
+
+                if stopped.is_set():
+                    if ring.empty():
+                        break
+                    continue
+                stopped.wait(interval)
+                interval = min(interval * 2, ring_poll_max)
+        finally:
+            ring.close()
+            with self.conns_lock:
+                self.pollers.discard(threading.current_thread())
+
+
+class forward_client_t:
+    """把记录发给持有文件锁的进程, 连接失败后每 retry_interval 秒重试一次
+
+    ring_size 不为 None 时记录经由 ring_size 字节的共享内存发送, 连接只用于告知名字和检测对方是否退出
+    """
+
+    def __init__(self, path: str, ring_size: int | None = None) -> None:
+        self.path = path
+        self.sock: socket.socket | None = None
+        self.encoder = binary_encoder_t()
+        self.retry_interval = 0.5
+        self.retry_time = 0.0
+
+        self.ring_size = ring_size
+        self.ring: shm_ring_t | None = None
+        # 共享内存满时等待接收方读取, 每隔 ring_check_interval 秒检查一次对方是否还在
+        self.ring_wait = 0.0005
+        self.ring_check_interval = 0.1
+
+    @property
+    def connected(self) -> bool:
+        return self.sock is not None
+
+    def connect(self) -> bool:
+        now = time.monotonic()
+        if now < self.retry_time:
+            return False
+        self.retry_time = now + self.retry_interval
+
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        ring = None
+        try:
+            sock.connect(self.path)
+            if self.ring_size is None:
+                sock.sendall(self.encoder.start())
+            else:
+                ring = shm_ring_t.create(self.ring_size)
+                ring.write(self.encoder.start())
+                sock.sendall(magic + self.encoder.frame(FRAME_RING, pack_string(ring.name)))
+        except OSError:
+            if ring is not None:
+                ring.discard()
+            sock.close()
+            return False
+        self.sock = sock
+        self.ring = ring
+        return True
+
+    def alive(self) -> bool:
+        """对方关闭连接时 recv 返回空"""
+        assert self.sock is not None
+        try:
+            return self.sock.recv(1, socket.MSG_DONTWAIT) != b""
+        except BlockingIOError:
+            return True
+        except OSError:
+            return False
+
+    def write_ring(self, data: bytes) -> bool:
+        """写入完整的帧, 空间不够时等待; 对方退出时返回 False"""
+        assert self.ring is not None
+        check_time = time.monotonic() + self.ring_check_interval
+        while not self.ring.write(data):
+            time.sleep(self.ring_wait)
+            if time.monotonic() >= check_time:
+                if not self.alive():
+                    return False
+                check_time = time.monotonic() + self.ring_check_interval
+        return True
+
+    def send(self, records: list[record_t]) -> bool:
+        """发送一批记录, 连接断开时这一批丢失, 返回 False"""
+        assert self.sock is not None
+        if self.ring is not None:
+            # 写共享内存不会因为对方退出而失败, 每批检查一次连接, 与 socket 方式每批一次 sendall 相当
+            if not self.alive():
+                self.close()
+                return False
+
+            # 按帧拆分, 保证每次写入共享内存的都是完整的帧
+            limit = self.ring.capacity // 2
+            pieces: list[bytes] = []
+            size = 0
+            for record in records:
+                data = self.encoder.encode(record)
+                if len(data) > limit:
+                    # 单条记录太大, 丢弃; 它可能带着字典帧, 让双方从头建立字典
+                    self.encoder.start()
+                    data = self.encoder.frame(FRAME_RESET, b"")
+                if size + len(data) > limit and pieces:
+                    if not self.write_ring(b"".join(pieces)):
+                        self.close()
+                        return False
+                    pieces.clear()
+                    size = 0
+                pieces.append(data)
+                size += len(data)
+            if pieces and not self.write_ring(b"".join(pieces)):
+                self.close()
+                return False
+            return True
+
+        data = b"".join(map(self.encoder.encode, records))
+        try:
+            self.sock.sendall(data)
+        except OSError:
+            self.close()
+            return False
+        return True
+
+    def close(self) -> None:
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+        # 接收方取完剩余的记录后删除共享内存
+        if self.ring is not None:
+            self.ring.close()
+            self.ring = None
@@ -0,0 +1,196 @@
+__all__ = ["binary_encoder_t", "binary_decoder_t", "decode_records"]
+
+import os
+import mmap
+import struct
+from typing import Iterator
+
+from .context import context_t
+from .callsite import callsite_t
+from .record import record_t
+
+# 二进制日志文件格式:
+#   文件头 magic, 之后是连续的帧
+#   帧: 负载长度 u32, 帧类型 u8, 负载
+#   RESET   : 清空字典, 紧跟在文件头之后, 每个文件的字典各自独立
+#   CONTEXT : 编号 u32, nid u64, pid i64, tid i64, nname, pname, tname
+#   SITE    : 编号 u32, file, func
+#   RECORD  : ts f64, seq i64, level u8, context 编号 u32, site 编号 u32, lineno i32, message
+# 字符串为 u32 长度 + utf-8, RECORD 的 message 占据负载剩余部分
+magic = b"EPB\x01"
+
+FRAME_RESET = 0
+FRAME_CONTEXT = 1
+FRAME_SITE = 2
+FRAME_RECORD = 3
+
+frame_header = struct.Struct("<IB")
+context_header = struct.Struct("<IQqq")
+site_header = struct.Struct("<I")
+record_header = struct.Struct("<dqBIIi")
+string_header = struct.Struct("<I")
+
+# 按 id 查找的缓存上限, rawlog 等每条记录新建 context 的场景下不会无限增长
+interned_ids_max = 64 * 1024
+
+
+def pack_string(text: str) -> bytes:
+    data = text.encode()
+    return string_header.pack(len(data)) + data
+
+
+def unpack_string(data: memoryview, offset: int) -> tuple[str, int]:
+    (n,) = string_header.unpack_from(data, offset)
+    offset += string_header.size
+    return str(data[offset : offset + n], "utf-8"), offset + n
+
+
+class binary_encoder_t:
+    """把记录编码为二进制帧, context 和 site 在每个文件中只写一次"""
+
+    def __init__(self) -> None:
+        self.contexts: dict[context_t, int] = {}
+        self.sites: dict[callsite_t, int] = {}
+        # 以 id 为键, 值中保留对象的强引用, 保证 id 不会被复用; 命中时省掉按字段计算 hash
+        self.context_ids: dict[int, tuple[context_t, int]] = {}
+        self.site_ids: dict[int, tuple[callsite_t, int]] = {}
+
+    def frame(self, frame_type: int, payload: bytes) -> bytes:
+        return frame_header.pack(len(payload), frame_type) + payload
+
+    def start(self) -> bytes:
+        """打开新文件时调用, 返回文件头"""
+        self.contexts.clear()
+        self.sites.clear()
+        self.context_ids.clear()
+        self.site_ids.clear()
+        return magic + self.frame(FRAME_RESET, b"")
+
+    def intern_context(self, context: context_t, out: list[bytes]) -> int:
+        entry = self.context_ids.get(id(context))
+        if entry is not None:
+            return entry[1]
+
+        index = self.contexts.get(context)
+        if index is None:
+            index = len(self.contexts)
+            self.contexts[context] = index
+            out.append(
+                self.frame(
+                    FRAME_CONTEXT,
+                    context_header.pack(index, context.nid, context.pid, context.tid)
+                    + pack_string(context.nname)
+                    + pack_string(context.pname)
+                    + pack_string(context.tname),
+                )
+            )
+
+        if len(self.context_ids) >= interned_ids_max:
+            self.context_ids.clear()
+        self.context_ids[id(context)] = (context, index)
+        return index
+
+    def intern_site(self, site: callsite_t, out: list[bytes]) -> int:
+        entry = self.site_ids.get(id(site))
+        if entry is not None:
+            return entry[1]
+
+        index = self.sites.get(site)
+        if index is None:
+            index = len(self.sites)
+            self.sites[site] = index
+            out.append(
+                self.frame(
+                    FRAME_SITE,
+                    site_header.pack(index) + pack_string(site.file) + pack_string(site.func),
+                )
+            )
+
+        if len(self.site_ids) >= interned_ids_max:
+            self.site_ids.clear()
+        self.site_ids[id(site)] = (site, index)
+        return index
+
+    def encode(self, record: record_t) -> bytes:
+        out: list[bytes] = []
+        context_index = self.intern_context(record.context, out)
+        site_index = self.intern_site(record.site, out)
+
+        message = record.get_message().encode()
+        header = record_header.pack(
+            record.ts, record.seq, record.level, context_index, site_index, record.lineno
+        )
+        out.append(
+            frame_header.pack(record_header.size + len(message), FRAME_RECORD) + header + message
+        )
+        return b"".join(out) if len(out) > 1 else out[0]
+
+
+def iter_frames(
+    data: bytes | memoryview | mmap.mmap, offset: int | None = None
+) -> Iterator[tuple[int, int, memoryview]]:
+    """按顺序返回 (帧偏移, 帧类型, 负载), 末尾不完整的帧忽略; offset 为 None 时从文件头之后开始"""
+    view = memoryview(data)
+    if offset is None:
+        if view[: len(magic)] != magic:
+            raise ValueError("不是二进制日志文件")
+        pos = len(magic)
+    else:
+        pos = offset
+
+    end = len(view)
+    while pos + frame_header.size <= end:
+        n, frame_type = frame_header.unpack_from(view, pos)
+        start = pos + frame_header.size
+        if start + n > end:
+            break
+        yield pos, frame_type, view[start : start + n]
+        pos = start + n
+
+
+class binary_decoder_t:
+    """按顺序读入字典帧, 解码记录帧"""
+
+    def __init__(self) -> None:
+        self.contexts: dict[int, context_t] = {}
+        self.sites: dict[int, callsite_t] = {}
+
+    def define(self, frame_type: int, payload: memoryview) -> None:
+        if frame_type == FRAME_CONTEXT:
+            index, nid, pid, tid = context_header.unpack_from(payload)
+            nname, pos = unpack_string(payload, context_header.size)
+            pname, pos = unpack_string(payload, pos)
+            tname, pos = unpack_string(payload, pos)
+            self.contexts[index] = context_t(
+                nid=nid, nname=nname, pid=pid, pname=pname, tid=tid, tname=tname
+            )
+        elif frame_type == FRAME_SITE:
+            (index,) = site_header.unpack_from(payload)
+            file, pos = unpack_string(payload, site_header.size)
+            func, pos = unpack_string(payload, pos)
+            self.sites[index] = callsite_t(file=file, basename=os.path.basename(file), func=func)
+        elif frame_type == FRAME_RESET:
+            self.contexts.clear()
+            self.sites.clear()
+
+    def decode(self, payload: memoryview) -> record_t:
+        ts, seq, level, context_index, site_index, lineno = record_header.unpack_from(payload)
+        return record_t(
+            ts=ts,
+            seq=seq,
+            level=level,
+            context=self.contexts[context_index],
+            site=self.sites[site_index],
+            lineno=lineno,
+            message=str(payload[record_header.size :], "utf-8"),
+        )
+
+
+def decode_records(data: bytes | memoryview) -> Iterator[tuple[int, record_t]]:
+    """按顺序解码二进制日志, 返回 (帧偏移, 记录)"""
+    decoder = binary_decoder_t()
+    for offset, frame_type, payload in iter_frames(data):
+        if frame_type == FRAME_RECORD:
+            yield offset, decoder.decode(payload)
+        else:
+            decoder.define(frame_type, payload)
@@ -0,0 +1,38 @@
+__all__ = ["callsite_t", "get_callsite"]
+
+import os
+import pathlib
+import types
+from dataclasses import dataclass
+
+
+@dataclass(slots=True, frozen=True)
+class callsite_t:
+    file: str = ""
+    basename: str = ""
+    func: str = ""
+
+
+nosite = callsite_t()
+
+# 以 id(code) 为键, 值中保留 code 的强引用, 保证 id 不会被复用
+# code 对象的 __hash__ 需要遍历字节码和常量, 比 id 慢得多
+callsites: dict[int, tuple[types.CodeType, callsite_t]] = {}
+callsites_max = 64 * 1024
+
+
+def get_callsite(code: types.CodeType) -> callsite_t:
+    """返回调用点的缓存信息, 同一个 code 对象只做一次路径规范化"""
+    entry = callsites.get(id(code))
+    if entry is not None:
+        return entry[1]
+
+    file = pathlib.PurePath(code.co_filename).as_posix()
+    callsite = callsite_t(file=file, basename=os.path.basename(file), func=code.co_qualname)
+
+    # exec 等动态生成的 code 会不断增加, 超过上限直接清空
+    if len(callsites) >= callsites_max:
+        callsites.clear()
+    callsites[id(code)] = (code, callsite)
+
+    return callsite
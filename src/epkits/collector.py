@@ -0,0 +1,121 @@
+"""接收 net_sink_t 发来的记录, 写入与本地相同的日志文件, 按相同的规则轮转
+
+python -m epkits.collector --tcp 127.0.0.1:9020 --udp 127.0.0.1:9020 --dir ./collected
+
+各来源的记录按到达顺序写入同一组文件, 每条记录保留来源进程的 pid 和线程
+"""
+
+__all__ = ["udp_server_t"]
+
+import argparse
+import os
+import signal
+import socket
+import struct
+import sys
+import threading
+import time
+from typing import Callable
+
+from .record import record_t
+from .binary import decode_records
+from .aggregate import aggregate_server_t
+from .logger_server import logger_server
+
+
+class udp_server_t:
+    """每个数据报自带字典, 单独解码"""
+
+    def __init__(self, address: tuple[str, int], handle: Callable[[record_t], None]) -> None:
+        self.address = address
+        self.handle = handle
+        self.sock: socket.socket | None = None
+
+    def start(self) -> None:
+        family = socket.AF_INET6 if ":" in self.address[0] else socket.AF_INET
+        sock = socket.socket(family, socket.SOCK_DGRAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 * 1024 * 1024)
+        sock.bind(self.address)
+        self.sock = sock
+        threading.Thread(target=self.receive, args=(sock,), name="epcollect.udp", daemon=True).start()
+
+    def stop(self) -> None:
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+    def receive(self, sock: socket.socket) -> None:
+        while True:
+            try:
+                data = sock.recv(65536)
+            except OSError:
+                break
+            try:
+                for offset, record in decode_records(data):
+                    self.handle(record)
+            except (KeyError, ValueError, struct.error):
+                # 不完整或不是 epkits 的数据报
+                continue
+
+
+def parse_address(text: str) -> tuple[str, int]:
+    """host:port, [::1]:port 或 :port"""
+    host, sep, port = text.rpartition(":")
+    if not sep or not port.isdigit():
+        raise argparse.ArgumentTypeError(f"无法识别的地址: {text}")
+    return host.strip("[]") or "0.0.0.0", int(port)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m epkits.collector", description="日志收集器")
+    parser.add_argument("--tcp", type=parse_address, help="监听 TCP 地址, 如 127.0.0.1:9020")
+    parser.add_argument("--udp", type=parse_address, help="监听 UDP 地址")
+    parser.add_argument("--dir", default="./collected")
+    parser.add_argument("--prefix", default="ep")
+    parser.add_argument("--log-size", type=int, default=logger_server.log_size, help="轮转大小 (字节)")
+    parser.add_argument("--log-count", type=int, default=logger_server.log_count)
+    parser.add_argument("--rotate-when", choices=["H", "D"], help="按整点或整天 (UTC) 轮转")
+    parser.add_argument("--segment", action="store_true", help="段模式")
+    parser.add_argument("--compress", choices=["gzip", "lzma", "bz2"])
+    parser.add_argument("--format", choices=["text", "binary"], default="text")
+    parser.add_argument("--index", action="store_true", help="写稀疏索引")
+    args = parser.parse_args()
+    if args.tcp is None and args.udp is None:
+        parser.error("至少需要 --tcp 或 --udp")
+
+    logger_server.dir = args.dir
+    logger_server.prefix = args.prefix
+    logger_server.log_size = args.log_size
+    logger_server.log_count = args.log_count
+    logger_server.rotate_when = args.rotate_when
+    logger_server.segment_mode = args.segment
+    logger_server.compress = args.compress
+    logger_server.log_format = args.format
+    logger_server.index_mode = args.index
+    # 收集器自己独占目录, 不接收本机其他进程的转发
+    logger_server.aggregate = False
+    os.makedirs(args.dir, exist_ok=True)
+    logger_server.init()
+
+    servers: list[aggregate_server_t | udp_server_t] = []
+    if args.tcp is not None:
+        servers.append(aggregate_server_t(args.tcp, logger_server.receive))
+    if args.udp is not None:
+        servers.append(udp_server_t(args.udp, logger_server.receive))
+
+    # SIGTERM 也走正常退出, 由 atexit 写完队列中的记录
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        for server in servers:
+            server.start()
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for server in servers:
+            server.stop()
+
+
+if __name__ == "__main__":
+    main()
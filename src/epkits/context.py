@@ -0,0 +1,87 @@
+__all__ = ["context_t", "get_context", "set_node"]
+
+import os
+import uuid
+import platform
+import threading
+import multiprocessing
+import multiprocessing.process
+from dataclasses import dataclass, field
+
+
+@dataclass(slots=True, frozen=True)
+class context_t:
+    nid: int = 0
+    nname: str = ""
+    pid: int = -1
+    pname: str = ""
+    tid: int = -1
+    tname: str = ""
+
+    generation: int = field(default=-1, repr=False, compare=False)
+    thread: threading.Thread | None = field(default=None, repr=False, compare=False)
+    process: multiprocessing.process.BaseProcess | None = field(
+        default=None, repr=False, compare=False
+    )
+
+
+nocontext = context_t()
+
+node = {
+    "nid": uuid.getnode(),
+    "nname": platform.node(),
+}
+
+local = threading.local()
+
+# fork 后子进程的 pid 变了, 但 fork 线程的 threading.local 会被继承, 用代数让它失效
+generation = 0
+
+
+def set_node(nid: int | None = None, nname: str | None = None) -> None:
+    global generation
+    if nid is not None:
+        node["nid"] = nid
+    if nname is not None:
+        node["nname"] = nname
+    generation += 1
+
+
+def after_fork_in_child() -> None:
+    global generation
+    generation += 1
+
+
+os.register_at_fork(after_in_child=after_fork_in_child)
+
+
+def get_context() -> context_t:
+    """返回当前线程的 nid/nname/pid/pname/tid/tname, 每个线程只计算一次
+
+    fork 之后, 线程/进程改名之后, 或 set_node 之后重新计算
+    """
+    context = getattr(local, "context", None)
+    # 直接读 _name 而不是 name 属性, 省掉两次 property 调用
+    if (
+        context is not None
+        and context.generation == generation
+        and context.thread._name is context.tname
+        and context.process._name is context.pname
+    ):
+        return context
+
+    thread = threading.current_thread()
+    process = multiprocessing.current_process()
+    context = context_t(
+        nid=node["nid"],
+        nname=node["nname"],
+        pid=os.getpid(),
+        pname=process.name,
+        tid=threading.get_ident(),
+        tname=thread.name,
+        generation=generation,
+        thread=thread,
+        process=process,
+    )
+    local.context = context
+    return context
@@ -1,12 +1,22 @@
-__all__ = ["exception_t", "enable_debug", "set_level", "get_level", "is_debug_enabled"]
+__all__ = [
+    "exception_t",
+    "enable_debug",
+    "set_level",
+    "get_level",
+    "set_location",
+    "get_location",
+    "is_debug_enabled",
+]
 
 import copy
 
 from .level import level_t
+from .location import location_t
 
 conf = {
     "debug": False,
     "level": level_t.I,
+    "location": {level: location_t.FULL for level in level_t},
 }
 
 
@@ -32,6 +42,21 @@ def get_level() -> level_t:
     return conf["level"]
 
 
+def set_location(location: location_t, level: level_t | None = None) -> None:
+    """设置调用位置的采集方式, level 为 None 时设置所有级别"""
+    global conf
+    if level is None:
+        for level in level_t:
+            conf["location"][level] = location
+    else:
+        conf["location"][level] = location
+
+
+def get_location(level: level_t) -> location_t:
+    global conf
+    return conf["location"][level]
+
+
 def enable_debug() -> None:
     global conf
     conf["debug"] = True
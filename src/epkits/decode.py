@@ -0,0 +1,51 @@
+"""把二进制日志解码为文本, 输出与文本格式的日志文件逐行相同
+
+python -m epkits.decode                  解码 ./log 下所有日志, 从旧到新
+python -m epkits.decode ep.000012.log.gz 解码指定文件
+"""
+
+__all__ = ["decode_file"]
+
+import argparse
+import sys
+from typing import Iterator
+
+from .binary import magic, decode_records
+from .segment import list_logs, open_segment, logical_length
+
+
+def decode_file(path: str) -> Iterator[str]:
+    """逐条返回文本行, 文本格式的文件原样返回"""
+    with open_segment(path) as f:
+        data = f.read()
+    data = data[: logical_length(data)]
+
+    if not data.startswith(magic):
+        yield data.decode(errors="replace")
+        return
+
+    for offset, record in decode_records(data):
+        yield str(record)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m epkits.decode", description="二进制日志转文本")
+    parser.add_argument("files", nargs="*", help="日志文件, 默认为 --dir 下的所有日志")
+    parser.add_argument("--dir", default="./log")
+    parser.add_argument("--prefix", default="ep")
+    args = parser.parse_args()
+
+    files = args.files or list_logs(args.dir, args.prefix)
+    out = sys.stdout
+    try:
+        for path in files:
+            for line in decode_file(path):
+                out.write(line)
+        out.flush()
+    except BrokenPipeError:
+        # 输出到 head 等提前退出的管道
+        sys.stderr.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -40,6 +40,11 @@ class filelock_t:
                     msvcrt.locking(self.file.fileno(), msvcrt.LK_NBLCK, 1)  # Windows 非阻塞锁
                 else:
                     fcntl.flock(self.file, fcntl.LOCK_EX | fcntl.LOCK_NB)  # Linux/macOS 非阻塞锁
+                    # 上一个持有者释放时删除了锁文件, 锁住的是已删除的文件, 重新打开再试
+                    if not self.is_current():
+                        self.file.close()
+                        self.file = open(self.file_path, "w")
+                        continue
                 return True  # 获取锁成功
             except (BlockingIOError, OSError):  # 文件被锁定
                 if not blocking:
@@ -52,6 +57,16 @@ class filelock_t:
                     raise TimeoutError("获取文件锁超时")
                 time.sleep(self.check_interval)  # 等待后重试
 
+    def is_current(self) -> bool:
+        """打开的文件仍然是 file_path 指向的文件"""
+        assert self.file is not None
+        try:
+            st = os.stat(self.file_path)
+        except FileNotFoundError:
+            return False
+        fst = os.fstat(self.file.fileno())
+        return (st.st_dev, st.st_ino) == (fst.st_dev, fst.st_ino)
+
     def release(self) -> None:
         """释放文件锁"""
         if self.file:
@@ -59,11 +74,14 @@ class filelock_t:
                 if os.name == "nt":
                     msvcrt.locking(self.file.fileno(), msvcrt.LK_UNLCK, 1)  # Windows 释放锁
                 else:
+                    # 持有锁时删除锁文件, 等待的进程拿到锁后会发现文件已删除
+                    os.remove(self.file_path)
                     fcntl.flock(self.file, fcntl.LOCK_UN)  # Linux/macOS 释放锁
             finally:
                 self.file.close()
                 self.file = None
-                os.remove(self.file_path)  # 删除锁文件
+                if os.name == "nt":
+                    os.remove(self.file_path)  # 删除锁文件
 
     def __enter__(self) -> Self:
         """支持 with 语句"""
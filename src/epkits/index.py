@@ -0,0 +1,128 @@
+__all__ = ["index_writer_t", "read_index", "scan_records", "build_index"]
+
+import calendar
+import os
+import re
+import struct
+import time
+from typing import Iterator
+
+from .level import level_t
+from .binary import magic, iter_frames, record_header, FRAME_RECORD
+from .segment import open_segment, index_path, logical_length
+
+# 索引文件: magic, 之后是定长的条目, 每个条目描述一块连续的记录:
+#   块内第一条记录的 ts f64, seq i64, 块在日志文件 (未压缩) 中的字节偏移 u64, 块内出现过的级别位图 u32
+index_magic = b"EPI\x01"
+index_entry = struct.Struct("<dqQI")
+
+# 文本日志的记录头: [20240102.030405.123456    123][I]
+text_header = re.compile(rb"^\[(\d{8}\.\d{6})\.(\d{6}) +(-?\d+)\]\[([A-Z])\]", re.MULTILINE)
+level_names = {name.encode(): int(level) for name, level in level_t.__members__.items()}
+
+
+class index_writer_t:
+    """写日志时逐条登记记录, 每 every 条或每 size 字节结束一块并写一个条目"""
+
+    def __init__(self, path: str, every: int, size: int, *, append: bool = False) -> None:
+        self.every = every
+        self.size = size
+        # 不缓冲, 每次 flush() 一次写入, fork 出的子进程关闭它时不会写出父进程缓冲的数据
+        self.file = open(path, "ab" if append else "wb", buffering=0)
+        if self.file.tell() == 0:
+            self.file.write(index_magic)
+
+        self.pending: list[bytes] = []
+        self.count = 0
+        self.ts = 0.0
+        self.seq = 0
+        self.offset = 0
+        self.levels = 0
+
+    def add(self, ts: float, seq: int, level: int, offset: int, size: int) -> None:
+        if self.count == 0:
+            self.ts = ts
+            self.seq = seq
+            self.offset = offset
+        self.count += 1
+        self.levels |= 1 << level
+        if self.count >= self.every or offset + size - self.offset >= self.size:
+            self.end_block()
+
+    def end_block(self) -> None:
+        if self.count:
+            self.pending.append(index_entry.pack(self.ts, self.seq, self.offset, self.levels))
+            self.count = 0
+            self.levels = 0
+
+    def flush(self) -> None:
+        """在日志数据写入之后调用, 条目不会指向还没写入的数据"""
+        if self.pending:
+            self.file.write(b"".join(self.pending))
+            self.pending.clear()
+
+    def close(self) -> None:
+        self.end_block()
+        self.flush()
+        self.file.close()
+
+
+def read_index(path: str) -> list[tuple[float, int, int, int]]:
+    """读取索引, 返回 (ts, seq, offset, levels) 列表; 没有索引或格式不对时返回空列表"""
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError:
+        return []
+    if not data.startswith(index_magic):
+        return []
+    # 崩溃时最后一个条目可能只写了一半
+    end = len(data) - (len(data) - len(index_magic)) % index_entry.size
+    return list(index_entry.iter_unpack(data[len(index_magic) : end]))
+
+
+def parse_ts(text: bytes, μs: bytes, cache: dict[bytes, int]) -> float:
+    seconds = cache.get(text)
+    if seconds is None:
+        seconds = calendar.timegm(time.strptime(text.decode(), "%Y%m%d.%H%M%S"))
+        cache[text] = seconds
+    return seconds + int(μs) / 1_000_000
+
+
+def scan_records(data: bytes | memoryview) -> Iterator[tuple[int, float, int, int]]:
+    """按顺序返回每条记录的 (偏移, ts, seq, level), 只解析记录头, 文本和二进制格式都支持"""
+    if bytes(data[: len(magic)]) == magic:
+        for offset, frame_type, payload in iter_frames(data):
+            if frame_type == FRAME_RECORD:
+                ts, seq, level = record_header.unpack_from(payload)[:3]
+                yield offset, ts, seq, level
+        return
+
+    cache: dict[bytes, int] = {}
+    for m in text_header.finditer(data):
+        level = level_names.get(m.group(4))
+        if level is None:
+            continue
+        yield m.start(), parse_ts(m.group(1), m.group(2), cache), int(m.group(3)), level
+
+
+def build_index(path: str, every: int = 1024, size: int = 64 * 1024) -> str:
+    """为已有的日志文件 (可以是压缩的) 重建索引, 返回索引文件路径"""
+    with open_segment(path) as f:
+        data = f.read()
+    data = data[: logical_length(data)]
+
+    idx = index_path(path)
+    tmp = idx + ".tmp"
+    writer = index_writer_t(tmp, every, size)
+    previous = None
+    for record in scan_records(data):
+        # 记录的长度要等到下一条记录的偏移才知道
+        if previous is not None:
+            writer.add(*previous[1:], previous[0], record[0] - previous[0])
+        previous = record
+    if previous is not None:
+        writer.add(*previous[1:], previous[0], len(data) - previous[0])
+    writer.close()
+    os.replace(tmp, idx)
+    return idx
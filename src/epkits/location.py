@@ -0,0 +1,9 @@
+__all__ = ["location_t"]
+
+from enum import IntEnum
+
+
+class location_t(IntEnum):
+    OFF = 0  # 不采集调用位置
+    CHEAP = 1  # 只采集文件和函数, 不解析行号
+    FULL = 2  # 文件, 行号和函数
@@ -1,35 +1,47 @@
 __all__ = ["logger"]
 
+import os
 import queue
-import threading
-import multiprocessing
+import itertools
 import time
-import os
 import sys
-import pathlib
 import uuid
 import platform
+from typing import Any, Callable, Iterator
 
-from .core import get_level, is_debug_enabled
+from .core import get_level, get_location, is_debug_enabled
 from .zero import get_frame
+from .context import get_context, set_node
+from .callsite import get_callsite, nosite
 from .level import level_t
+from .location import location_t
 from .record import record_t
+from .seq import shared_seq_t
 from .logger_server import logger_server
 
 
 class logger_t:
     def __init__(self):
-        self.seq = 0
-        self.seq_lock = threading.Lock()
+        # next() 在 C 层完成, 受 GIL 保护是原子的, 不需要加锁; 分配顺序即全局顺序
+        self.seq_counter: Iterator[int] = itertools.count(1)
 
         self.refresh_nid()
         self.refresh_nname()
 
+    def after_fork_in_child(self) -> None:
+        # 子进程的 pid 不同, 本进程的序号从头开始; 跨进程序号取新的块
+        if isinstance(self.seq_counter, shared_seq_t):
+            self.seq_counter.after_fork()
+        else:
+            self.seq_counter = itertools.count(1)
+
     def refresh_nid(self) -> None:
         self.nid = uuid.getnode()
+        set_node(nid=self.nid)
 
     def refresh_nname(self) -> None:
         self.nname = platform.node()
+        set_node(nname=self.nname)
 
     def get_nid(self) -> int:
         return self.nid
@@ -41,10 +53,7 @@ class logger_t:
         if level < get_level():
             return 0
 
-        with self.seq_lock:
-            self.seq += 1
-
-        return self.seq
+        return next(self.seq_counter)
 
     def output(self, record: record_t) -> None:
         if is_debug_enabled() and record.level == level_t.T:
@@ -52,6 +61,46 @@ class logger_t:
 
         logger_server.handle(record)
 
+    def emit(self, record: record_t) -> None:
+        if record.level < get_level():
+            return
+
+        self.output(record)
+
+    def make_record(
+        self,
+        level: level_t,
+        seq: int,
+        message: str | Callable[[], str] = "",
+        args: tuple[Any, ...] = (),
+        *,
+        back: int = 0,
+    ) -> record_t:
+        """构造一条日志记录, back = 0 表示调用 make_record 的函数
+
+        message 可以是 % 格式模板(配合 args)或返回字符串的函数, 格式化推迟到写日志线程
+        """
+        location = get_location(level)
+        frame = get_frame(back + 1) if location != location_t.OFF else None
+        if frame:
+            site = get_callsite(frame.f_code)
+            # f_lineno 需要解码行号表, 开销比取栈帧本身还大
+            lineno = frame.f_lineno if location == location_t.FULL else 0
+        else:
+            site = nosite
+            lineno = 0
+
+        return record_t(
+            ts=time.time(),
+            seq=seq,
+            level=level,
+            context=get_context(),
+            site=site,
+            lineno=lineno,
+            message=message,
+            args=args,
+        )
+
     def rawlog(
         self,
         ts: float,
@@ -66,177 +115,66 @@ class logger_t:
         file: str,
         lineno: int,
         func: str,
-        message: str,
+        message: str | Callable[[], str],
+        args: tuple[Any, ...] = (),
     ) -> None:
         if level < get_level():
             return
 
-        record = record_t(
-            ts=ts,
-            seq=seq,
-            level=level,
-            nid=nid,
-            nname=nname,
-            pid=pid,
-            pname=pname,
-            tid=tid,
-            tname=tname,
-            file=file,
-            lineno=lineno,
-            func=func,
-            message=message,
+        self.output(
+            record_t.make(
+                ts=ts,
+                seq=seq,
+                level=level,
+                nid=nid,
+                nname=nname,
+                pid=pid,
+                pname=pname,
+                tid=tid,
+                tname=tname,
+                file=file,
+                lineno=lineno,
+                func=func,
+                message=message,
+                args=args,
+            )
         )
-        self.output(record)
 
-    def debug(self, message: str = "", *, back: int = 0) -> None:
+    def debug(self, message: str | Callable[[], str] = "", *args: Any, back: int = 0) -> None:
         seq = self.get_seq(level_t.D)
         if seq == 0:
             return
 
-        frame = get_frame(back + 1)
-
-        record = record_t(
-            ts=time.time(),
-            seq=seq,
-            level=level_t.D,
-            nid=self.nid,
-            nname=self.nname,
-            pid=os.getpid(),
-            pname=multiprocessing.current_process().name,
-            tid=threading.get_ident(),
-            tname=threading.current_thread().name,
-            file="",
-            lineno=0,
-            func="",
-            message=message,
-        )
+        self.output(self.make_record(level_t.D, seq, message, args, back=back + 1))
 
-        if frame:
-            record.file = pathlib.PurePath(frame.f_code.co_filename).as_posix()
-            record.lineno = frame.f_lineno
-            record.func = frame.f_code.co_qualname
-
-        self.rawlog(**record.__dict__)
-
-    def info(self, message: str = "", *, back: int = 0) -> None:
+    def info(self, message: str | Callable[[], str] = "", *args: Any, back: int = 0) -> None:
         seq = self.get_seq(level_t.I)
         if seq == 0:
             return
 
-        frame = get_frame(back + 1)
+        self.output(self.make_record(level_t.I, seq, message, args, back=back + 1))
 
-        record = record_t(
-            ts=time.time(),
-            seq=seq,
-            level=level_t.I,
-            nid=self.nid,
-            nname=self.nname,
-            pid=os.getpid(),
-            pname=multiprocessing.current_process().name,
-            tid=threading.get_ident(),
-            tname=threading.current_thread().name,
-            file="",
-            lineno=0,
-            func="",
-            message=message,
-        )
-
-        if frame:
-            record.file = pathlib.PurePath(frame.f_code.co_filename).as_posix()
-            record.lineno = frame.f_lineno
-            record.func = frame.f_code.co_qualname
-
-        self.rawlog(**record.__dict__)
-
-    def warning(self, message: str = "", *, back: int = 0) -> None:
+    def warning(self, message: str | Callable[[], str] = "", *args: Any, back: int = 0) -> None:
         seq = self.get_seq(level_t.W)
         if seq == 0:
             return
 
-        frame = get_frame(back + 1)
-
-        record = record_t(
-            ts=time.time(),
-            seq=seq,
-            level=level_t.W,
-            nid=self.nid,
-            nname=self.nname,
-            pid=os.getpid(),
-            pname=multiprocessing.current_process().name,
-            tid=threading.get_ident(),
-            tname=threading.current_thread().name,
-            file="",
-            lineno=0,
-            func="",
-            message=message,
-        )
+        self.output(self.make_record(level_t.W, seq, message, args, back=back + 1))
 
-        if frame:
-            record.file = pathlib.PurePath(frame.f_code.co_filename).as_posix()
-            record.lineno = frame.f_lineno
-            record.func = frame.f_code.co_qualname
-
-        self.rawlog(**record.__dict__)
-
-    def error(self, message: str = "", *, back: int = 0) -> None:
+    def error(self, message: str | Callable[[], str] = "", *args: Any, back: int = 0) -> None:
         seq = self.get_seq(level_t.E)
         if seq == 0:
             return
 
-        frame = get_frame(back + 1)
+        self.output(self.make_record(level_t.E, seq, message, args, back=back + 1))
 
-        record = record_t(
-            ts=time.time(),
-            seq=seq,
-            level=level_t.E,
-            nid=self.nid,
-            nname=self.nname,
-            pid=os.getpid(),
-            pname=multiprocessing.current_process().name,
-            tid=threading.get_ident(),
-            tname=threading.current_thread().name,
-            file="",
-            lineno=0,
-            func="",
-            message=message,
-        )
-
-        if frame:
-            record.file = pathlib.PurePath(frame.f_code.co_filename).as_posix()
-            record.lineno = frame.f_lineno
-            record.func = frame.f_code.co_qualname
-
-        self.rawlog(**record.__dict__)
-
-    def test(self, message: str = "", *, back: int = 0) -> None:
+    def test(self, message: str | Callable[[], str] = "", *args: Any, back: int = 0) -> None:
         seq = self.get_seq(level_t.T)
         if seq == 0:
             return
 
-        frame = get_frame(back + 1)
-
-        record = record_t(
-            ts=time.time(),
-            seq=seq,
-            level=level_t.T,
-            nid=self.nid,
-            nname=self.nname,
-            pid=os.getpid(),
-            pname=multiprocessing.current_process().name,
-            tid=threading.get_ident(),
-            tname=threading.current_thread().name,
-            file="",
-            lineno=0,
-            func="",
-            message=message,
-        )
-
-        if frame:
-            record.file = pathlib.PurePath(frame.f_code.co_filename).as_posix()
-            record.lineno = frame.f_lineno
-            record.func = frame.f_code.co_qualname
-
-        self.rawlog(**record.__dict__)
+        self.output(self.make_record(level_t.T, seq, message, args, back=back + 1))
 
 
 logger = logger_t()
+os.register_at_fork(after_in_child=logger.after_fork_in_child)
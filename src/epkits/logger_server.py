@@ -6,15 +6,113 @@ import sys
 import time
 import threading
 import queue
+import io
+import mmap
+import socket
+import itertools
+import collections
+import operator
+import multiprocessing.util
+from typing import Callable
 
+from .core import is_debug_enabled
+from .level import level_t
+from .policy import policy_t
+from .sync import sync_t
 from .record import record_t
+from .context import get_context
 from .mlogger import mlogger
 from .filelock import filelock_t
+from .segment import segment_path, list_segments, compress_file, compress_suffixes, log_suffixes
+from .segment import trailer, trailer_magic, recover_trailer, index_path, index_suffix
+from .sink import sink_t, take_batch
+from .binary import magic, binary_encoder_t
+from .index import index_writer_t
+from .aggregate import aggregate_server_t, forward_client_t
+
+seq_key = operator.attrgetter("seq")
+
+# macOS 和 Windows 没有 fdatasync
+fdatasync = getattr(os, "fdatasync", os.fsync)
 
 
 class logger_server_t:
     def __init__(self) -> None:
-        self.rotate_last_time = 0
+        self.dir = "./log"
+        self.prefix = "ep"
+
+        # 轮转: 写入字节数达到 log_size 或到达 rotate_when 的整点/整天时轮转, None 表示不按该条件轮转
+        self.log_size: int | None = 1024 * 1024 * 10
+        self.log_count = 10
+        self.rotate_when: str | None = None  # "H" 每小时, "D" 每天 (UTC)
+        self.rotate_at = 0.0
+        self.log_bytes = 0
+        # 新文件写完文件头后的长度, 到轮转时间还是这个长度说明整个周期没有记录; 接着写已有的文件时为 -1
+        self.head_bytes = -1
+
+        # 段模式: 轮转时新建编号递增的 ep.000123.log, ep.log 软链接指向当前段,
+        # 超过 log_count 的旧段由后台线程删除, 轮转的开销与保留的段数无关
+        self.segment_mode = False
+        self.segment_id = -1
+        self.prune_queue: queue.Queue[int | None] = queue.Queue()
+        self.prune_thread: threading.Thread | None = None
+
+        # 轮转出的旧日志由后台线程压缩, compress 为 "gzip", "lzma", "bz2", None 表示不压缩
+        # 系统平均负载超过 cpu 数 * compress_load 时推迟 compress_wait 秒再检查
+        self.compress: str | None = None
+        self.compress_level: int | None = None
+        self.compress_load = 0.7
+        self.compress_wait = 5
+        # 队列中是轮转时文件的名字和 (st_dev, st_ino), 压缩时按 inode 找到它现在的名字
+        self.compress_queue: queue.Queue[tuple[str, tuple[int, int]]] = queue.Queue()
+        self.compress_thread: threading.Thread | None = None
+        # 轮转改名和压缩完成后的改名互斥
+        self.rotate_lock = threading.Lock()
+
+        # 日志文件自己的级别过滤和格式, 与其他输出端互不影响
+        self.level = level_t.N
+        self.formatter: Callable[[record_t], str] = str
+
+        # "binary" 时日志文件写二进制帧, 不做文本格式化, 用 python -m epkits.decode 转为文本
+        # formatter 对二进制格式无效, 快速通道始终是文本
+        self.log_format = "text"
+        self.encoder: binary_encoder_t | None = None
+
+        # 其他输出端, 每个有自己的队列和写线程; 替换整个元组而不是原地修改, handle() 遍历时不用加锁
+        self.sinks: tuple[sink_t, ...] = ()
+        # fork 出的转发子进程继承的输出端, 父进程已经分发子进程转发的记录, 子进程接管后才启动
+        self.fork_sinks: tuple[sink_t, ...] = ()
+
+        # mmap 模式: 文件预分配后映射到内存, 写日志只是内存拷贝, 没有 write() 系统调用,
+        # 突发写入时也不会因为文件系统分配块而卡顿. 预分配 max(mmap_size, log_size), 不够时再扩 mmap_size,
+        # 轮转或关闭时截断到实际长度. 文件末尾的 trailer 记录实际长度, 崩溃后下次打开时据此截断
+        self.mmap_mode = False
+        self.mmap_size = 1024 * 1024 * 16
+        self.log_map: mmap.mmap | None = None
+        self.log_map_size = 0
+
+        # 稀疏索引: 每 index_every 条或每 index_size 字节在 ep.0.log.idx 中写一个条目,
+        # 随日志文件一起轮转, 可以用 python -m epkits.reindex 为已有的日志重建
+        self.index_mode = False
+        self.index_every = 1024
+        self.index_size = 1024 * 64
+        self.indexer: index_writer_t | None = None
+
+        # 多进程: 持有文件锁的进程在 ep.sock 上接收其他进程的记录, 拿不到锁的进程进入转发模式,
+        # 把记录批量发给它; 持有者退出后由转发的进程接管. aggregate 为 False 时拿不到锁一直等待
+        self.aggregate = hasattr(socket, "AF_UNIX")
+        self.aggregator: aggregate_server_t | None = None
+        self.forwarder: forward_client_t | None = None
+        # 转发方式: "socket" 经由 ep.sock 发送, "shm" 经由每个进程 ring_size 字节的共享内存发送
+        self.transport = "socket"
+        self.ring_size = 1024 * 1024 * 8
+        # 转发连接断开期间普通队列和每个线程本地缓冲区最多保留的记录数, 超过后按 policy 处理
+        self.forward_backlog = 10 * 1000
+
+        # 跨进程序号: 设置为文件路径后, 使用同一个文件的进程共用一个递增的序号, 每次预留 seq_block 个, 见 shared_seq_t.
+        # 写日志线程把每批记录按 seq 排序, 转发来的记录与本进程的记录交错时也按序号写入
+        self.seq_path: str | None = None
+        self.seq_block = 1024
 
         self.log_file = None
         self.log_quick_file = None
@@ -22,35 +120,254 @@ class logger_server_t:
         self.log_queue = queue.Queue(maxsize=1000 * 1000)
         self.log_quick_queue = queue.Queue(maxsize=1000 * 1000)
 
+        # 批量写: 一次最多取 batch_count 条, 缓冲超过 flush_size 字节或 flush_ms 毫秒后写一次
+        self.batch_count = 4096
+        self.flush_size = 1024 * 256
+        self.flush_ms = 100
+
+        self.log_buffer: list[bytes] = []
+        self.log_buffer_size = 0
+        self.log_buffer_time = 0.0
+
+        # 落盘策略, 见 sync_t; sync_time 为最早一条未落盘记录进入缓冲区的时间, 0 表示没有未落盘的记录
+        self.sync = sync_t.NONE
+        self.sync_ms = 50
+        self.sync_level = level_t.E
+        self.sync_time = 0.0
+
+        # fdatasync 耗时统计, 单位秒, sync_recent 保留最近的若干次用于计算分位数
+        self.sync_count = 0
+        self.sync_total = 0.0
+        self.sync_max = 0.0
+        self.sync_recent: collections.deque[float] = collections.deque(maxlen=1024)
+
+        # 队列满时的处理策略, 按级别设置
+        self.policy: dict[int, policy_t] = {level: policy_t.DROP_NEWEST for level in level_t}
+        self.block_timeout: float | None = 0.1
+        self.sample_watermark = 0.5
+        self.sample_every = 10
+        self.sample_counter = itertools.count()
+
+        # 丢弃计数, 每 drop_report_interval 秒输出一条汇总记录
+        self.dropped: dict[int, int] = {level: 0 for level in level_t}
+        self.dropped_lock = threading.Lock()
+        self.drop_report_interval = 10
+        self.drop_report_time = 0.0
+
+        # 线程本地缓冲: 生产者把记录追加到本线程的 deque, 不经过 queue.Queue 的锁和条件变量,
+        # 入队开销不随线程数增加. 写日志线程依次取出各线程的记录, 同一批内按 seq 排序.
+        # 每个缓冲区最多 local_max 条, 超过时丢弃新记录, 不使用按级别设置的 policy
+        self.local_mode = False
+        self.local_max = 100 * 1000
+        self.local = threading.local()
+        # 注册时整体替换列表, 写日志线程遍历时不用加锁
+        self.local_buffers: list[tuple[threading.Thread, collections.deque[record_t]]] = []
+        self.local_lock = threading.Lock()
+
+        # handle() 放入记录后唤醒写日志线程, 两条队列共用
+        self.log_event = threading.Event()
+
         self.log_thread_stop = 0
         self.log_thread = threading.Thread(target=self.worker, name="eplog", daemon=True)
 
     def init(self):
-        self.dir = "./log"
-        self.prefix = "ep"
-        self.log_size = 1024 * 1024 * 10
-        self.log_count = 10
-
         self.fl = filelock_t(os.path.join(self.dir, f"{self.prefix}.lock"))
-        self.fl.acquire()
+        if not self.aggregate:
+            self.fl.acquire()
+        elif not self.fl.acquire(blocking=False):
+            ring_size = self.ring_size if self.transport == "shm" else None
+            self.forwarder = forward_client_t(self.sock_path(), ring_size)
+        else:
+            # 持有者在这里开始接收, 之后 fork 的子进程据此决定是否转发
+            self.serve()
+        # 后台线程在这里启动, 不等到第一次轮转: 轮转可能发生在退出时, 那时已经不能创建线程
+        if self.segment_mode:
+            self.start_pruner()
+        if self.compress is not None:
+            self.start_compressor()
         self.log_thread.start()
         atexit.register(self.exit)
 
-    def handle(self, record: record_t, *, quick: bool = False) -> None:
-        if quick:
-            try:
-                self.log_quick_queue.put_nowait(record)
-            except queue.Full:
-                pass
-            except AttributeError:
-                pass
+    def sock_path(self) -> str:
+        return os.path.join(self.dir, f"{self.prefix}.sock")
+
+    def set_policy(self, policy: policy_t, level: level_t | None = None) -> None:
+        """设置队列满时的处理策略, level 为 None 时设置所有级别"""
+        if level is None:
+            for level in level_t:
+                self.policy[level] = policy
+        else:
+            self.policy[level] = policy
+
+    def add_sink(self, sink: sink_t) -> None:
+        sink.start()
+        self.sinks = (*self.sinks, sink)
+
+    def remove_sink(self, sink: sink_t) -> None:
+        self.sinks = tuple(s for s in self.sinks if s is not sink)
+        sink.stop()
+
+    def drop(self, level: int) -> None:
+        with self.dropped_lock:
+            self.dropped[level] = self.dropped.get(level, 0) + 1
+
+    def put(self, log_queue: queue.Queue, record: record_t) -> bool:
+        policy = self.policy.get(record.level, policy_t.DROP_NEWEST)
+
+        if policy == policy_t.SAMPLE:
+            if log_queue.qsize() >= log_queue.maxsize * self.sample_watermark:
+                if next(self.sample_counter) % self.sample_every:
+                    self.drop(record.level)
+                    return False
+
+        try:
+            if policy == policy_t.BLOCK:
+                log_queue.put(record, timeout=self.block_timeout)
+            else:
+                log_queue.put_nowait(record)
+        except queue.Full:
+            if policy != policy_t.DROP_OLDEST:
+                self.drop(record.level)
+                return False
+
+            # 最旧的记录不允许丢弃时, 改为丢弃新记录
+            with log_queue.mutex:
+                records = log_queue.queue
+                oldest = records[0] if records else None
+                if oldest is not None and self.policy.get(oldest.level) == policy_t.BLOCK:
+                    oldest = record
+                else:
+                    if records:
+                        records.popleft()
+                    records.append(record)
+                    log_queue.not_empty.notify()
+            if oldest is not None:
+                self.drop(oldest.level)
+            if oldest is record:
+                return False
+
+        return True
+
+    def handle(self, record: record_t, *, quick: bool = False, forwarded: bool = False) -> None:
+        if not quick:
+            # 快速通道的记录同时也会进入普通通道, 只分发一次
+            sinks = self.sinks
+            if sinks:
+                # 分发前格式化, 输出端和写日志线程只读取结果, 延迟的消息只计算一次
+                record.get_message()
+                for sink in sinks:
+                    sink.handle(record)
+            if record.level < self.level:
+                return
+
+        # 转发来的记录 seq 属于其他进程, 不进线程本地缓冲区, 见 sweep()
+        if self.local_mode and not quick and not forwarded:
+            buffer = getattr(self.local, "buffer", None)
+            if buffer is None:
+                buffer = self.register()
+            if len(buffer) >= self.local_max:
+                self.drop(record.level)
+                return
+            buffer.append(record)
         else:
             try:
-                self.log_queue.put_nowait(record)
-            except queue.Full:
-                pass
+                if not self.put(self.log_quick_queue if quick else self.log_queue, record):
+                    return
             except AttributeError:
-                pass
+                return
+
+        # 已经置位时不再加锁
+        if not self.log_event.is_set():
+            self.log_event.set()
+
+    def register(self) -> collections.deque[record_t]:
+        buffer: collections.deque[record_t] = collections.deque()
+        with self.local_lock:
+            self.local_buffers = [*self.local_buffers, (threading.current_thread(), buffer)]
+        self.local.buffer = buffer
+        return buffer
+
+    def sweep(self) -> tuple[list[record_t], bool]:
+        """取出队列和各线程缓冲区中的记录, 返回记录和是否还有没取完的"""
+        queued = self.take(self.log_queue)
+        more = len(queued) >= self.batch_count
+        records: list[record_t] = []
+        runs = 0
+        dead = False
+
+        for thread, buffer in self.local_buffers:
+            n = len(buffer)
+            if n == 0:
+                dead = dead or not thread.is_alive()
+                continue
+            if n > self.batch_count:
+                n = self.batch_count
+                more = True
+            # deque.popleft 与另一个线程的 append 可以并发, 不需要加锁
+            popleft = buffer.popleft
+            records.extend([popleft() for i in range(n)])
+            runs += 1
+
+        if dead:
+            with self.local_lock:
+                self.local_buffers = [
+                    (thread, buffer)
+                    for thread, buffer in self.local_buffers
+                    if buffer or thread.is_alive()
+                ]
+
+        # 每个线程的记录已经按 seq 有序, 多个有序段合并排序很快.
+        # 队列中主要是其他进程转发来的记录, 各进程的 seq 互不相关, 设置了 seq_path 才一起排序, 否则接在前面
+        if self.seq_path is None:
+            if runs > 1:
+                records.sort(key=seq_key)
+            return queued + records, more
+        records = queued + records
+        records.sort(key=seq_key)
+        return records, more
+
+    def receive(self, record: record_t) -> None:
+        """其他进程转发来的记录"""
+        if is_debug_enabled() and record.level == level_t.T:
+            self.handle(record, quick=True)
+        self.handle(record, forwarded=True)
+
+    def dropped_record(self, now: float) -> record_t | None:
+        """把最近一段时间的丢弃计数作为一条记录"""
+        interval = now - self.drop_report_time
+        self.drop_report_time = now
+
+        with self.dropped_lock:
+            dropped = {level: n for level, n in self.dropped.items() if n}
+            for level in dropped:
+                self.dropped[level] = 0
+
+        if not dropped:
+            return None
+
+        text = ", ".join(f"{n} 条 {level_t(level).name}" for level, n in dropped.items())
+        return record_t(
+            ts=time.time(),
+            level=level_t.W,
+            context=get_context(),
+            lineno=0,
+            message=f"队列已满, 最近 {interval:.0f}s 丢弃日志: {text}",
+        )
+
+    def pending(self) -> bool:
+        """队列或线程本地缓冲区中还有记录"""
+        if self.log_queue.qsize() or self.log_quick_queue.qsize():
+            return True
+        return any(buffer for thread, buffer in self.local_buffers)
+
+    def report_dropped(self, now: float) -> None:
+        record = self.dropped_record(now)
+        if record is None or self.log_file is None:
+            return
+
+        if not self.log_buffer:
+            self.log_buffer_time = now
+        self.buffer(record, self.encode(record))
 
     def open(self) -> None:
         if not os.path.exists(self.dir):
@@ -64,13 +381,333 @@ class logger_server_t:
         except OSError:
             self.log_quick_file = None
 
+        self.encoder = binary_encoder_t() if self.log_format == "binary" else None
+
+        recover_trailer(self.log_path())
+
         try:
-            self.log_file = open(os.path.join(self.dir, f"{self.prefix}.0.log"), "ab", buffering=0)
-            self.log_file.write("\n\n\n\n\n\n\n\n\n\n".encode())
-        except OSError:
+            self.log_file = open(self.log_path(), "a+b" if self.mmap_mode else "ab", buffering=0)
+            # 只在打开时取一次大小, 之后按写入的字节数累计
+            self.log_bytes = os.fstat(self.log_file.fileno()).st_size
+            if self.mmap_mode:
+                self.map(max(self.mmap_size, self.log_size or 0, self.log_bytes + self.mmap_size))
+        except (OSError, ValueError):
             self.log_file = None
 
+        if self.log_file is not None:
+            # 二进制格式每次启动都从新文件开始, 上次崩溃时写了一半的帧不会影响之后的解码;
+            # 文本格式遇到二进制文件也轮转出去, 不在同一个文件里混写两种格式
+            if self.log_bytes and (self.encoder is not None or self.is_binary()):
+                self.rotate()
+                return
+
+            if self.encoder is not None:
+                head = self.encoder.start()
+            else:
+                head = "\n\n\n\n\n\n\n\n\n\n".encode()
+            existing = self.log_bytes
+            self.write_log(head)
+            self.head_bytes = -1 if existing else self.log_bytes
+
+            if self.index_mode:
+                try:
+                    self.indexer = index_writer_t(
+                        index_path(self.log_path()),
+                        self.index_every,
+                        self.index_size,
+                        append=existing > 0,
+                    )
+                except OSError:
+                    self.indexer = None
+
+        if self.segment_mode and self.log_file is not None:
+            self.link()
+
+        self.rotate_at = self.next_rotate_at(time.time())
+
+    def is_binary(self) -> bool:
+        try:
+            with open(self.log_path(), "rb") as f:
+                return f.read(len(magic)) == magic
+        except OSError:
+            return False
+
+    def encode(self, record: record_t) -> bytes:
+        if self.encoder is not None:
+            return self.encoder.encode(record)
+        return self.formatter(record).encode()
+
+    def log_path(self) -> str:
+        if not self.segment_mode:
+            return os.path.join(self.dir, f"{self.prefix}.0.log")
+
+        if self.segment_id < 0:
+            # 启动时接着最新的段写
+            segments = list_segments(self.dir, self.prefix)
+            if not segments:
+                self.segment_id = 1
+            elif segments[-1][1].endswith(".log"):
+                self.segment_id = segments[-1][0]
+            else:
+                self.segment_id = segments[-1][0] + 1
+            self.prune()
+        return segment_path(self.dir, self.prefix, self.segment_id)
+
+    def link(self) -> None:
+        """原子地把 ep.log 指向当前段"""
+        link = os.path.join(self.dir, f"{self.prefix}.log")
+        link_tmp = link + ".tmp"
+        try:
+            if os.path.lexists(link_tmp):
+                os.remove(link_tmp)
+            os.symlink(os.path.basename(self.log_path()), link_tmp)
+            os.replace(link_tmp, link)
+        except OSError:
+            pass
+
+    def start_pruner(self) -> None:
+        if self.prune_thread is None:
+            thread = threading.Thread(target=self.pruner, name="epprune", daemon=True)
+            thread.start()
+            self.prune_thread = thread
+
+    def prune(self) -> None:
+        last_id = self.segment_id - self.log_count
+        try:
+            self.start_pruner()
+        except RuntimeError:
+            # 退出时才第一次轮转, 解释器关闭阶段不能再创建线程, 在写日志线程中直接删除
+            self.prune_segments(last_id)
+            return
+        self.prune_queue.put(last_id)
+
+    def pruner(self) -> None:
+        while True:
+            last_id = self.prune_queue.get()
+            if last_id is None:
+                break
+            self.prune_segments(last_id)
+
+    def prune_segments(self, last_id: int) -> None:
+        """删除编号不大于 last_id 的段和它们的索引"""
+        for segment_id, path in list_segments(self.dir, self.prefix):
+            if segment_id > last_id:
+                break
+            for file in (path, index_path(path)):
+                try:
+                    os.remove(file)
+                except OSError:
+                    pass
+
+    def start_compressor(self) -> None:
+        if self.compress_thread is None:
+            thread = threading.Thread(target=self.compressor, name="epcompress", daemon=True)
+            thread.start()
+            self.compress_thread = thread
+
+    def compress_later(self, path: str) -> None:
+        if self.compress is None:
+            return
+        try:
+            st = os.stat(path)
+        except OSError:
+            return
+        try:
+            self.start_compressor()
+        except RuntimeError:
+            # 解释器关闭阶段不能再创建线程, 不压缩, 保留原文件
+            return
+        self.compress_queue.put((path, (st.st_dev, st.st_ino)))
+
+    def busy(self) -> bool:
+        try:
+            load = os.getloadavg()[0]
+        except (AttributeError, OSError):
+            return False
+        return load > (os.cpu_count() or 1) * self.compress_load
+
+    def compressor(self) -> None:
+        while True:
+            path, file_id = self.compress_queue.get()
+            while self.busy():
+                time.sleep(self.compress_wait)
+            try:
+                self.compress_one(path, file_id)
+            except OSError:
+                pass
+
+    def find_rotated(self, path: str, file_id: tuple[int, int]) -> str | None:
+        """轮转可能已经把文件改名或删除, 按 inode 找到它现在的名字, 调用时持有 rotate_lock"""
+        if self.segment_mode:
+            candidates = [path]
+        else:
+            candidates = [
+                os.path.join(self.dir, f"{self.prefix}.{i}.log") for i in range(1, self.log_count)
+            ]
+        for candidate in candidates:
+            try:
+                st = os.stat(candidate)
+            except OSError:
+                continue
+            if (st.st_dev, st.st_ino) == file_id:
+                return candidate
+        return None
+
+    def compress_one(self, path: str, file_id: tuple[int, int]) -> None:
+        assert self.compress is not None
+        suffix = compress_suffixes[self.compress]
+
+        # 等待期间可能又轮转了几次, 按名字打开会压缩到别的文件
+        with self.rotate_lock:
+            current = self.find_rotated(path, file_id)
+            if current is None:
+                return
+            src = open(current, "rb")
+
+        tmp = os.path.join(self.dir, f"{self.prefix}.compress.tmp")
+        with src:
+            compress_file(src, tmp, self.compress, self.compress_level)
+
+        with self.rotate_lock:
+            current = self.find_rotated(path, file_id)
+            if current is None:
+                os.remove(tmp)
+                return
+            os.replace(tmp, current + suffix)
+            os.remove(current)
+
+    def next_rotate_at(self, now: float) -> float:
+        if self.rotate_when == "H":
+            period = 3600
+        elif self.rotate_when == "D":
+            period = 86400
+        else:
+            return 0.0
+        return (now // period + 1) * period
+
+    def take(self, log_queue: queue.Queue) -> list[record_t]:
+        return take_batch(log_queue, self.batch_count)
+
+    def write(self, file: io.FileIO, data: bytes) -> None:
+        # 无缓冲的 FileIO 可能只写入一部分
+        view = memoryview(data)
+        while view:
+            n = file.write(view)
+            view = view[n:]
+
+    def map(self, size: int) -> None:
+        """预分配到 size 字节并重新映射"""
+        assert self.log_file is not None
+        if self.log_map is not None:
+            self.log_map.close()
+            self.log_map = None
+
+        fd = self.log_file.fileno()
+        try:
+            os.posix_fallocate(fd, 0, size)
+        except (AttributeError, OSError):
+            # 不支持 fallocate 的平台和文件系统退化为稀疏文件
+            os.ftruncate(fd, size)
+        self.log_map = mmap.mmap(fd, size)
+        self.log_map_size = size
+
+    def write_log(self, data: bytes) -> None:
+        assert self.log_file is not None
+        if self.log_map is None:
+            self.write(self.log_file, data)
+            self.log_bytes += len(data)
+            return
+
+        start = self.log_bytes
+        end = start + len(data)
+        if end + trailer.size > self.log_map_size:
+            self.map(end + trailer.size + self.mmap_size)
+        self.log_map[start:end] = data
+        self.log_map[self.log_map_size - trailer.size :] = trailer.pack(trailer_magic, end)
+        self.log_bytes = end
+
+    def unmap(self) -> None:
+        """解除映射, 截断到实际长度"""
+        assert self.log_file is not None and self.log_map is not None
+        self.log_map.close()
+        self.log_map = None
+        self.log_map_size = 0
+        os.ftruncate(self.log_file.fileno(), self.log_bytes)
+
+    def buffer(self, record: record_t, data: bytes) -> None:
+        if self.indexer is not None:
+            offset = self.log_bytes + self.log_buffer_size
+            self.indexer.add(record.ts, record.seq, record.level, offset, len(data))
+        self.log_buffer.append(data)
+        self.log_buffer_size += len(data)
+
+    def append(self, records: list[record_t]) -> None:
+        """编码后放入缓冲区, 写入字节数达到 log_size 时立即轮转"""
+        if self.log_size is None and self.indexer is None:
+            if self.encoder is not None:
+                data = b"".join(map(self.encoder.encode, records))
+            else:
+                data = "".join(map(self.formatter, records)).encode()
+            self.log_buffer.append(data)
+            self.log_buffer_size += len(data)
+            return
+
+        for record in records:
+            self.buffer(record, self.encode(record))
+            if self.log_size is not None and self.log_bytes + self.log_buffer_size >= self.log_size:
+                self.rotate()
+
+    def flush(self) -> None:
+        if self.log_buffer and self.log_file is not None:
+            self.write_log(b"".join(self.log_buffer))
+            if self.indexer is not None:
+                self.indexer.flush()
+        self.log_buffer.clear()
+        self.log_buffer_size = 0
+
+    def datasync(self) -> None:
+        """写入缓冲区并 fdatasync, mmap 模式用 msync"""
+        self.flush()
+        self.sync_time = 0.0
+        if self.log_file is None:
+            return
+
+        start = time.perf_counter()
+        try:
+            if self.log_map is not None:
+                self.log_map.flush()
+            else:
+                fdatasync(self.log_file.fileno())
+        except OSError:
+            return
+        elapsed = time.perf_counter() - start
+
+        self.sync_count += 1
+        self.sync_total += elapsed
+        self.sync_max = max(self.sync_max, elapsed)
+        self.sync_recent.append(elapsed)
+
+    def sync_stats(self) -> dict[str, float]:
+        """fdatasync 次数和耗时 (毫秒), p50/p99 按最近的记录计算"""
+        recent = sorted(self.sync_recent)
+        n = len(recent)
+        return {
+            "count": self.sync_count,
+            "avg_ms": self.sync_total / self.sync_count * 1000 if self.sync_count else 0.0,
+            "max_ms": self.sync_max * 1000,
+            "p50_ms": recent[n // 2] * 1000 if n else 0.0,
+            "p99_ms": recent[n * 99 // 100] * 1000 if n else 0.0,
+        }
+
     def close(self) -> None:
+        self.flush()
+        self.sync_time = 0.0
+
+        if self.indexer is not None:
+            indexer = self.indexer
+            self.indexer = None
+            indexer.close()
+
         if self.log_quick_file is not None:
             log_quick_file = self.log_quick_file
             self.log_quick_file = None
@@ -79,62 +716,333 @@ class logger_server_t:
             log_quick_file.close()
 
         if self.log_file is not None:
+            if self.log_map is not None:
+                self.unmap()
             log_file = self.log_file
             self.log_file = None
             log_file.flush()
             os.fsync(log_file.fileno())
             log_file.close()
 
+    def after_fork_in_child(self) -> None:
+        """fork 之后在子进程中调用
+
+        继承来的写日志线程已经不存在, 队列和锁可能处于加锁状态, 队列中是父进程的记录.
+        换成新的队列和锁, 只关闭继承的描述符 (文件锁, 日志文件, 套接字仍由父进程使用),
+        然后重新启动写日志线程: 父进程在转发或者在接收时转发给持有者, 否则等待持有者退出, 之后由子进程接管
+        """
+        self.log_queue = queue.Queue(maxsize=self.log_queue.maxsize)
+        self.log_quick_queue = queue.Queue(maxsize=self.log_quick_queue.maxsize)
+        self.log_event = threading.Event()
+        self.dropped_lock = threading.Lock()
+        self.dropped = {level: 0 for level in level_t}
+        self.local = threading.local()
+        self.local_buffers = []
+        self.local_lock = threading.Lock()
+        self.rotate_lock = threading.Lock()
+        self.prune_queue = queue.Queue()
+        self.prune_thread = None
+        self.compress_queue = queue.Queue()
+        self.compress_thread = None
+        self.log_buffer = []
+        self.log_buffer_size = 0
+        self.sync_time = 0.0
+
+        started = self.log_thread.ident is not None
+        self.log_thread_stop = 0
+        self.log_thread = threading.Thread(target=self.worker, name="eplog", daemon=True)
+        if not started:
+            return
+
+        # 父进程是正在接收的持有者时, 子进程转发的记录由父进程分发给同一组输出端
+        parent_serving = self.aggregator is not None
+        forward = self.forwarder is not None or parent_serving
+        if self.aggregator is not None:
+            self.aggregator.abandon()
+            self.aggregator = None
+        if self.forwarder is not None:
+            self.forwarder.close()
+        if self.indexer is not None:
+            self.indexer.file.close()
+            self.indexer = None
+        if self.log_map is not None:
+            self.log_map.close()
+            self.log_map = None
+        for file in (self.log_file, self.log_quick_file):
+            if file is not None:
+                file.close()
+        self.log_file = None
+        self.log_quick_file = None
+        self.encoder = None
+
+        # flock 属于共用的打开文件, 子进程关闭自己的描述符不会释放父进程的锁
+        if self.fl.file is not None:
+            self.fl.file.close()
+        self.fl = filelock_t(self.fl.file_path)
+        if forward:
+            ring_size = self.ring_size if self.transport == "shm" else None
+            self.forwarder = forward_client_t(self.sock_path(), ring_size)
+        else:
+            self.forwarder = None
+
+        for sink in (*self.sinks, *self.fork_sinks):
+            sink.after_fork()
+        if parent_serving:
+            self.fork_sinks = (*self.fork_sinks, *self.sinks)
+            self.sinks = ()
+        for sink in self.sinks:
+            sink.start()
+        self.log_thread.start()
+        # multiprocessing 用 fork 启动的子进程以 os._exit 退出, 不执行 atexit
+        multiprocessing.util.Finalize(None, self.exit, exitpriority=0)
+
     def exit(self) -> None:
+        # atexit 和 multiprocessing 的退出处理可能都会调用
+        if self.log_thread_stop > 0 or self.log_thread.ident is None:
+            return
+        if self.aggregator is not None:
+            self.aggregator.stop()
         self.log_thread_stop = time.monotonic() + 1
+        self.log_event.set()
         self.log_thread.join()
+        for sink in self.sinks:
+            sink.stop()
         self.fl.release()
 
     def rotate(self) -> None:
-        if os.path.getsize(os.path.join(self.dir, f"{self.prefix}.0.log")) >= self.log_size:
-            self.close()
-
-            for i in range(self.log_count - 2, -1, -1):
-                log_file = os.path.join(self.dir, f"{self.prefix}.{i}.log")
-                log_file_new = os.path.join(self.dir, f"{self.prefix}.{i + 1}.log")
-                if os.path.exists(log_file_new):
-                    os.remove(log_file_new)
-                if os.path.exists(log_file):
-                    os.rename(log_file, log_file_new)
+        self.close()
 
+        if self.segment_mode:
+            self.compress_later(self.log_path())
+            self.segment_id += 1
             self.open()
+            self.prune()
+            return
+
+        with self.rotate_lock:
+            for i in range(self.log_count - 2, -1, -1):
+                for suffix in (*log_suffixes, index_suffix):
+                    log_file = os.path.join(self.dir, f"{self.prefix}.{i}.log{suffix}")
+                    log_file_new = os.path.join(self.dir, f"{self.prefix}.{i + 1}.log{suffix}")
+                    if os.path.exists(log_file_new):
+                        os.remove(log_file_new)
+                    if os.path.exists(log_file):
+                        os.rename(log_file, log_file_new)
 
-    def worker(self) -> None:
         self.open()
+        self.compress_later(os.path.join(self.dir, f"{self.prefix}.1.log"))
+
+    def timeout(self, now: float) -> float | None:
+        """写日志线程最多可以睡多久, None 表示一直等到 handle() 唤醒"""
+        timeouts = []
+        if self.log_buffer:
+            timeouts.append(self.flush_ms / 1000 - (now - self.log_buffer_time))
+        if self.log_thread_stop > 0:
+            timeouts.append(self.log_thread_stop - now)
+        if self.sync == sync_t.INTERVAL and self.sync_time:
+            timeouts.append(self.sync_ms / 1000 - (now - self.sync_time))
+        if any(self.dropped.values()):
+            timeouts.append(self.drop_report_interval - (now - self.drop_report_time))
+        if self.rotate_at:
+            # rotate_at 是墙上时间, 没有新记录也要按时轮转
+            timeouts.append(self.rotate_at - time.time())
+        if not timeouts:
+            return None
+        return max(0.0, min(timeouts))
 
+    def serve(self) -> None:
+        self.aggregator = aggregate_server_t(self.sock_path(), self.receive)
+        try:
+            self.aggregator.start()
+        except (OSError, RuntimeError):
+            # 进程很快退出时, 解释器关闭阶段不能再创建线程
+            self.aggregator.stop()
+            self.aggregator = None
+
+    def limit_backlog(self, maxsize: int, local_max: int) -> None:
+        """修改普通队列和线程本地缓冲区的上限, 生产者照常按 policy 丢弃或阻塞; 放宽时唤醒阻塞的生产者"""
+        with self.log_queue.mutex:
+            self.log_queue.maxsize = maxsize
+            self.log_queue.not_full.notify_all()
+        self.local_max = local_max
+
+    def wait_lock(self) -> bool:
+        """没有可以转发的进程时等待持有文件锁的进程退出, 接管成功返回 True; 期间积压的记录不超过 forward_backlog"""
+        maxsize = self.log_queue.maxsize
+        local_max = self.local_max
+        backlog = self.forward_backlog
+        self.limit_backlog(min(maxsize, backlog), min(local_max, backlog))
+
+        retry_time = 0.0
         while True:
             now = time.monotonic()
+            if now >= retry_time:
+                if self.fl.acquire(blocking=False):
+                    break
+                retry_time = now + self.fl.check_interval
+            if self.log_thread_stop > 0:
+                return False
+            self.log_event.wait(retry_time - now)
+            self.log_event.clear()
+
+        self.limit_backlog(maxsize, local_max)
+        self.log_event.set()
+        return True
+
+    def forward(self) -> bool:
+        """转发模式的写日志线程, 持有文件锁的进程退出后接管文件, 接管成功返回 True"""
+        forwarder = self.forwarder
+        assert forwarder is not None
+        self.drop_report_time = time.monotonic()
+
+        # 连接断开期间不取普通队列, 收紧上限, 积压的记录不超过 forward_backlog, 连接后恢复
+        maxsize = self.log_queue.maxsize
+        local_max = self.local_max
+        limited = False
+
+        while True:
+            now = time.monotonic()
+            timeouts = [] if forwarder.connected else [forwarder.retry_interval]
+            if self.log_thread_stop > 0:
+                timeouts.append(max(0.0, self.log_thread_stop - now))
+            self.log_event.wait(min(timeouts) if timeouts else None)
+            self.log_event.clear()
+
+            now = time.monotonic()
+
+            # 快速通道的记录同时也在普通通道中, 由接收方按级别决定是否写快速通道
+            self.take(self.log_quick_queue)
+
+            if not forwarder.connected and not forwarder.connect():
+                if self.fl.acquire(blocking=False):
+                    self.forwarder = None
+                    self.limit_backlog(maxsize, local_max)
+                    # 积压的记录接管后立即写入
+                    self.log_event.set()
+                    return True
+                if not limited:
+                    backlog = self.forward_backlog
+                    self.limit_backlog(min(maxsize, backlog), min(local_max, backlog))
+                    limited = True
+                if now > self.log_thread_stop > 0:
+                    break
+                continue
+
+            if limited:
+                self.limit_backlog(maxsize, local_max)
+                limited = False
+
+            if self.local_buffers:
+                records, more = self.sweep()
+            else:
+                records = self.take(self.log_queue)
+                more = len(records) >= self.batch_count
+
+            if now - self.drop_report_time >= self.drop_report_interval:
+                record = self.dropped_record(now)
+                if record is not None:
+                    records.append(record)
+
+            if records:
+                forwarder.send(records)
+
+            if more or (self.log_thread_stop > 0 and self.pending()):
+                self.log_event.set()
+            elif self.log_thread_stop > 0:
+                break
 
             if now > self.log_thread_stop > 0:
                 break
 
-            if now - self.rotate_last_time >= 60:
-                self.rotate_last_time = now
-                self.rotate()
+        forwarder.close()
+        return False
+
+    def worker(self) -> None:
+        if self.forwarder is not None:
+            if not self.forward():
+                return
+        elif self.fl.file is None and not self.wait_lock():
+            return
+
+        # 接管之后由本进程分发记录; 退出时才接管, 解释器关闭阶段不能再启动输出端的线程
+        for sink in self.fork_sinks:
+            try:
+                self.add_sink(sink)
+            except RuntimeError:
+                pass
+        self.fork_sinks = ()
+
+        self.drop_report_time = time.monotonic()
+        self.open()
+        if self.aggregate and self.aggregator is None:
+            self.serve()
+
+        while True:
+            self.log_event.wait(self.timeout(time.monotonic()))
+            self.log_event.clear()
 
-            while not self.log_quick_queue.empty():
-                if self.log_quick_file is not None:
-                    record = self.log_quick_queue.get_nowait()
-                    self.log_quick_file.write(str(record).encode())
+            now = time.monotonic()
+
+            # 按时间轮转: 先把上一个周期缓冲的记录写进旧文件
+            if self.rotate_at and time.time() >= self.rotate_at:
+                if self.log_bytes != self.head_bytes or self.log_buffer:
+                    self.rotate()
+                else:
+                    # 整个周期没有记录, 不轮转出空文件
+                    self.rotate_at = self.next_rotate_at(time.time())
+
+            if now - self.drop_report_time >= self.drop_report_interval:
+                self.report_dropped(now)
 
-            while not self.log_queue.empty():
-                if self.log_file is not None:
-                    record = self.log_queue.get_nowait()
-                    self.log_file.write(str(record).encode())
+            quick_records = self.take(self.log_quick_queue)
+            if quick_records and self.log_quick_file is not None:
+                self.write(self.log_quick_file, "".join(map(self.formatter, quick_records)).encode())
+
+            if self.local_buffers:
+                records, more = self.sweep()
             else:
-                if self.log_file is not None:
-                    try:
-                        record = self.log_queue.get(block=True, timeout=1)
-                        self.log_file.write(str(record).encode())
-                    except queue.Empty:
-                        pass
+                records = self.take(self.log_queue)
+                more = len(records) >= self.batch_count
+                if self.seq_path is not None and self.aggregator is not None:
+                    records.sort(key=seq_key)
+            if records and self.log_file is not None:
+                if not self.log_buffer:
+                    self.log_buffer_time = now
+                if not self.sync_time:
+                    self.sync_time = now
+                self.append(records)
+
+                if self.sync == sync_t.LEVEL:
+                    sync_level = self.sync_level
+                    if any(record.level >= sync_level for record in records):
+                        self.datasync()
+
+            if (
+                self.sync == sync_t.INTERVAL
+                and self.sync_time
+                and (now - self.sync_time) * 1000 >= self.sync_ms
+            ):
+                self.datasync()
+
+            if self.log_buffer_size >= self.flush_size or (
+                self.log_buffer and (now - self.log_buffer_time) * 1000 >= self.flush_ms
+            ):
+                self.flush()
+
+            # 一批没取完, 不等待继续取
+            # 退出时写入期间新来的记录也要取完
+            if len(quick_records) >= self.batch_count or more:
+                self.log_event.set()
+            elif self.log_thread_stop > 0 and self.pending():
+                self.log_event.set()
+            elif self.log_thread_stop > 0:
+                break
+
+            if now > self.log_thread_stop > 0:
+                break
 
         self.close()
 
 
 logger_server = logger_server_t()
+os.register_at_fork(after_in_child=logger_server.after_fork_in_child)
@@ -1,17 +1,16 @@
 __all__ = ["mlogger"]
 
-import threading
-import multiprocessing
-import os
+import itertools
 import sys
-import pathlib
-import platform
 import time
-import uuid
+from typing import Iterator
 
-from .core import is_debug_enabled
+from .core import get_location, is_debug_enabled
 from .zero import get_frame
+from .context import get_context
+from .callsite import get_callsite
 from .level import level_t
+from .location import location_t
 from .record import record_t
 
 
@@ -19,14 +18,10 @@ class mlogger_t:
     """迷你日志, 用于库调试自己使用. 请使用正式的logger"""
 
     def __init__(self) -> None:
-        self.seq_lock = threading.Lock()
-        self.seq = 0
+        self.seq_counter: Iterator[int] = itertools.count(1)
 
     def get_seq(self) -> int:
-        with self.seq_lock:
-            self.seq += 1
-
-        return self.seq
+        return next(self.seq_counter)
 
     def debug(self, message: str = "") -> None:
         if not is_debug_enabled():
@@ -36,24 +31,18 @@ class mlogger_t:
             ts=time.time(),
             seq=self.get_seq(),
             level=level_t.D,
-            nid=uuid.getnode(),
-            nname=platform.node(),
-            pid=os.getpid(),
-            pname=multiprocessing.current_process().name,
-            tid=threading.get_ident(),
-            tname=threading.current_thread().name,
-            file="",
+            context=get_context(),
             lineno=0,
-            func="",
             message=message,
         )
 
-        frame = get_frame(1)
+        location = get_location(level_t.D)
+        frame = get_frame(1) if location != location_t.OFF else None
 
         if frame:
-            record.file = pathlib.PurePath(frame.f_code.co_filename).as_posix()
-            record.lineno = frame.f_lineno
-            record.func = frame.f_code.co_qualname
+            record.site = get_callsite(frame.f_code)
+            if location == location_t.FULL:
+                record.lineno = frame.f_lineno
 
         sys.stdout.write(str(record))
         sys.stdout.flush()
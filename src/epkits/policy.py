@@ -0,0 +1,10 @@
+__all__ = ["policy_t"]
+
+from enum import IntEnum
+
+
+class policy_t(IntEnum):
+    DROP_NEWEST = 0  # 队列满时丢弃新记录
+    DROP_OLDEST = 1  # 队列满时丢弃最旧的记录
+    BLOCK = 2  # 队列满时阻塞, 超过 block_timeout 后丢弃新记录, None 表示不丢弃
+    SAMPLE = 3  # 队列超过 sample_watermark 后每 sample_every 条保留一条
@@ -0,0 +1,267 @@
+"""按时间, 级别, pid 和正则表达式查询日志, 按时间顺序输出, 支持轮转和压缩后的文件
+
+python -m epkits.query --since 20240102.030405 --until "2024-01-02 03:10" --level W --grep 超时
+python -m epkits.query --merge a/log/ep.0.log b/log/ep.0.log
+
+时间为 UTC, 与日志中的时间相同, 也可以是 unix 时间戳. --until 包含所给时间所在的整秒 (整分, 整天).
+有索引时用索引定位并跳过不含所需级别的块, 没有索引时对文本日志按时间二分查找.
+--merge 按 seq 归并多个文件, 用于共用 seq_path 的多个进程各自写的日志
+"""
+
+__all__ = ["query_t"]
+
+import argparse
+import bisect
+import calendar
+import heapq
+import itertools
+import mmap
+import operator
+import re
+import sys
+import time
+from typing import BinaryIO, Iterator
+
+from .level import level_t
+from .binary import magic, iter_frames, binary_decoder_t, record_header, FRAME_RECORD
+from .index import read_index, parse_ts
+from .segment import list_logs, open_segment, index_path, logical_length
+
+# 只解析过滤需要的记录头字段: 时间, 级别, pid
+text_header = re.compile(
+    rb"^\[(\d{8}\.\d{6})\.(\d{6}) +(-?\d+)\]\[([A-Z])\]\[[0-9a-f]+ +(-?\d+) ", re.MULTILINE
+)
+
+# 格式 -> 精度 (秒)
+time_formats = {
+    "%Y%m%d.%H%M%S": 1,
+    "%Y%m%d": 86400,
+    "%Y-%m-%dT%H:%M:%S": 1,
+    "%Y-%m-%d %H:%M:%S": 1,
+    "%Y-%m-%d %H:%M": 60,
+    "%Y-%m-%d": 86400,
+}
+
+
+def parse_period(text: str) -> tuple[float, float]:
+    """返回所给时间所在的区间 [start, end)"""
+    # 20240102.030405 也是合法的浮点数, 先按日志中的时间格式解析
+    for fmt, period in time_formats.items():
+        try:
+            start = calendar.timegm(time.strptime(text, fmt))
+        except ValueError:
+            continue
+        return start, start + period
+    try:
+        ts = float(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"无法识别的时间: {text}") from None
+    return ts, ts
+
+
+def parse_since(text: str) -> float:
+    return parse_period(text)[0]
+
+
+def parse_until(text: str) -> float:
+    return parse_period(text)[1]
+
+
+def load(path: str) -> bytes | mmap.mmap | None:
+    """未压缩的文件用 mmap, 压缩的文件解压到内存; 只返回 trailer 之前实际写入的部分"""
+    data: bytes | mmap.mmap
+    if path.endswith(".log"):
+        try:
+            with open(path, "rb") as f:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            # 空文件不能 mmap
+            return None
+    else:
+        try:
+            with open_segment(path) as f:
+                data = f.read()
+        except OSError:
+            return None
+
+    length = logical_length(data)
+    if length == len(data):
+        return data
+    trimmed = data[:length]
+    if isinstance(data, mmap.mmap):
+        data.close()
+    return trimmed
+
+
+class query_t:
+    def __init__(
+        self,
+        since: float | None = None,
+        until: float | None = None,  # 不包含
+        level: level_t = level_t.N,
+        pid: int | None = None,
+        grep: str | None = None,
+    ) -> None:
+        self.since = since
+        self.until = until
+        self.level = level
+        self.pid = pid
+        self.grep = re.compile(grep.encode()) if grep else None
+
+        self.levels = {level_t(l).name.encode() for l in level_t if l >= level}
+        # 索引中的级别位图
+        self.level_mask = sum(1 << l for l in level_t if l >= level)
+        self.ts_cache: dict[bytes, int] = {}
+
+    def ranges(self, data: bytes | mmap.mmap, path: str) -> list[tuple[int, int]]:
+        """需要扫描的字节范围"""
+        entries = read_index(index_path(path))
+        entries = [entry for entry in entries if entry[2] < len(data)]
+        if not entries:
+            return [(self.seek(data, self.since, 0), self.seek(data, self.until, len(data)))]
+
+        tss = [entry[0] for entry in entries]
+        first = 0
+        if self.since is not None:
+            # 从开始时间之前的最后一块开始
+            first = max(bisect.bisect_left(tss, self.since) - 1, 0)
+        last = len(entries)
+        if self.until is not None:
+            last = bisect.bisect_left(tss, self.until)
+
+        ranges = []
+        for i in range(first, last):
+            start = entries[i][2]
+            if i + 1 < len(entries):
+                end = entries[i + 1][2]
+                if not entries[i][3] & self.level_mask:
+                    continue
+            else:
+                # 最后一块之后可能还有没写进索引的记录
+                end = len(data)
+            if ranges and ranges[-1][1] == start:
+                ranges[-1] = (ranges[-1][0], end)
+            else:
+                ranges.append((start, end))
+        return ranges
+
+    def seek(self, data: bytes | mmap.mmap, ts: float | None, default: int) -> int:
+        """没有索引时对文本日志按时间二分查找, 返回第一条时间不小于 ts 的记录的偏移"""
+        if ts is None or data[: len(magic)] == magic:
+            return default
+
+        lo = 0
+        hi = len(data)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            m = text_header.search(data, mid, hi)
+            if m is None:
+                hi = mid
+                continue
+            record_ts = parse_ts(m.group(1), m.group(2), self.ts_cache)
+            if record_ts >= ts:
+                hi = mid
+            else:
+                lo = m.end()
+        # 区间内没有完整的记录头时 hi 直接缩到 mid, 之后的记录头未必都不早于 ts, 从 lo 向后逐条检查
+        for m in text_header.finditer(data, lo):
+            if parse_ts(m.group(1), m.group(2), self.ts_cache) >= ts:
+                return m.start()
+        return len(data)
+
+    def match_ts(self, ts: float) -> bool:
+        if self.since is not None and ts < self.since:
+            return False
+        if self.until is not None and ts >= self.until:
+            return False
+        return True
+
+    def scan_text(
+        self, data: bytes | mmap.mmap, start: int, end: int
+    ) -> Iterator[tuple[int, bytes]]:
+        matches = text_header.finditer(data, start, end)
+        m = next(matches, None)
+        while m is not None:
+            following = next(matches, None)
+            record_end = following.start() if following is not None else end
+            if (
+                m.group(4) in self.levels
+                and (self.pid is None or int(m.group(5)) == self.pid)
+                and self.match_ts(parse_ts(m.group(1), m.group(2), self.ts_cache))
+                and (self.grep is None or self.grep.search(data, m.start(), record_end))
+            ):
+                yield int(m.group(3)), data[m.start() : record_end]
+            m = following
+
+    def scan_binary(
+        self, data: bytes | mmap.mmap, ranges: list[tuple[int, int]]
+    ) -> Iterator[tuple[int, bytes]]:
+        # 字典帧可能在任何位置, 范围外的帧只读字典, 记录帧只看帧头
+        decoder = binary_decoder_t()
+        i = 0
+        for offset, frame_type, payload in iter_frames(data):
+            if frame_type != FRAME_RECORD:
+                decoder.define(frame_type, payload)
+                continue
+            while i < len(ranges) and offset >= ranges[i][1]:
+                i += 1
+            if i == len(ranges):
+                break
+            if offset < ranges[i][0]:
+                continue
+
+            ts, seq, level, context_index = record_header.unpack_from(payload)[:4]
+            if level < self.level or not self.match_ts(ts):
+                continue
+            if self.pid is not None and decoder.contexts[context_index].pid != self.pid:
+                continue
+            text = str(decoder.decode(payload)).encode()
+            if self.grep is None or self.grep.search(text):
+                yield seq, text
+
+    def scan(self, path: str) -> Iterator[tuple[int, bytes]]:
+        """返回 (seq, 记录文本)"""
+        data = load(path)
+        if data is None:
+            return
+        ranges = self.ranges(data, path)
+        if data[: len(magic)] == magic:
+            yield from self.scan_binary(data, ranges)
+        else:
+            for start, end in ranges:
+                yield from self.scan_text(data, start, end)
+
+    def run(self, files: list[str], merge: bool = False) -> Iterator[bytes]:
+        if merge:
+            scans = heapq.merge(*map(self.scan, files), key=operator.itemgetter(0))
+        else:
+            scans = itertools.chain.from_iterable(map(self.scan, files))
+        for seq, text in scans:
+            yield text
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m epkits.query", description="查询日志")
+    parser.add_argument("files", nargs="*", help="日志文件, 默认为 --dir 下的所有日志, 从旧到新")
+    parser.add_argument("--dir", default="./log")
+    parser.add_argument("--prefix", default="ep")
+    parser.add_argument("--since", type=parse_since, help="开始时间 (UTC)")
+    parser.add_argument("--until", type=parse_until, help="结束时间 (UTC), 包含这一秒")
+    parser.add_argument("--level", type=lambda name: level_t[name], default=level_t.N, help="最低级别")
+    parser.add_argument("--pid", type=int)
+    parser.add_argument("--grep", help="正则表达式, 与 grep 一样匹配整条记录")
+    parser.add_argument("--merge", action="store_true", help="按 seq 归并各文件, 而不是依次输出")
+    args = parser.parse_args()
+
+    query = query_t(args.since, args.until, args.level, args.pid, args.grep)
+    out: BinaryIO = sys.stdout.buffer
+    try:
+        for text in query.run(args.files or list_logs(args.dir, args.prefix), args.merge):
+            out.write(text)
+        out.flush()
+    except BrokenPipeError:
+        sys.stderr.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -5,41 +5,151 @@ import math
 import os
 import json
 from dataclasses import dataclass
+from typing import Any, Callable
 
 from .level import level_t
+from .context import context_t, nocontext
+from .callsite import callsite_t, nosite
 
 
-@dataclass
+# 队列里可能积压上百万条记录, 用 slots 去掉每条记录的 __dict__
+# nid/nname/pid/pname/tid/tname 放在线程共享的 context 中, file/func 放在调用点共享的 site 中,
+# 每条记录只保存两个引用
+@dataclass(slots=True)
 class record_t:
     ts: float = 0
     seq: int = 0
     level: int = level_t.N
-    nid: int = 0
-    nname: str = ""
-    pid: int = -1
-    pname: str = ""
-    tid: int = -1
-    tname: str = ""
-    file: str = ""
+    context: context_t = nocontext
+    site: callsite_t = nosite
     lineno: int = -1
-    func: str = ""
-    message: str = ""
+    message: str | Callable[[], str] = ""
+    args: tuple[Any, ...] = ()
+    # get_message() 的结果, None 表示还没有格式化
+    text: str | None = None
+
+    @classmethod
+    def make(
+        cls,
+        ts: float = 0,
+        seq: int = 0,
+        level: int = level_t.N,
+        nid: int = 0,
+        nname: str = "",
+        pid: int = -1,
+        pname: str = "",
+        tid: int = -1,
+        tname: str = "",
+        file: str = "",
+        lineno: int = -1,
+        func: str = "",
+        message: str | Callable[[], str] = "",
+        args: tuple[Any, ...] = (),
+    ) -> "record_t":
+        """按展开的字段构造记录, 用于来源不是本线程的记录"""
+        return cls(
+            ts=ts,
+            seq=seq,
+            level=level,
+            context=context_t(nid=nid, nname=nname, pid=pid, pname=pname, tid=tid, tname=tname),
+            site=callsite_t(file=file, basename=os.path.basename(file), func=func),
+            lineno=lineno,
+            message=message,
+            args=args,
+        )
+
+    @property
+    def nid(self) -> int:
+        return self.context.nid
+
+    @property
+    def nname(self) -> str:
+        return self.context.nname
+
+    @property
+    def pid(self) -> int:
+        return self.context.pid
+
+    @property
+    def pname(self) -> str:
+        return self.context.pname
+
+    @property
+    def tid(self) -> int:
+        return self.context.tid
+
+    @property
+    def tname(self) -> str:
+        return self.context.tname
+
+    @property
+    def file(self) -> str:
+        return self.site.file
+
+    @property
+    def func(self) -> str:
+        return self.site.func
+
+    def get_message(self) -> str:
+        """延迟格式化, 结果保存到 text, 之后直接返回
+
+        写日志线程和各输出端的线程都可能格式化同一条记录: message 和 args 只读不改,
+        结果只赋值 text 一个字段, 同时格式化的线程得到相同的结果
+        """
+        text = self.text
+        if text is not None:
+            return text
+
+        message = self.message
+        args = self.args
+        try:
+            if callable(message):
+                message = message()
+            if args:
+                message = str(message) % args
+        except Exception as e:
+            message = f"{message!r} % {args!r} 格式化失败: {e!r}"
+
+        self.text = text = str(message)
+        return text
 
     def __str__(self) -> str:
+        context = self.context
+        site = self.site
         st = time.gmtime(self.ts)
         μs = int(math.modf(self.ts)[0] * 1_000_000)
 
         text = (
             f"[{st.tm_year:04d}{st.tm_mon:02d}{st.tm_mday:02d}.{st.tm_hour:02d}{st.tm_min:02d}{st.tm_sec:02d}.{μs:06d} {self.seq:6d}]"
             f"[{level_t(self.level).name}]"
-            f"[{self.nid:012x} {self.pid:6d} {self.tid:6d}]"
-            f"[{self.nname} {self.pname} {self.tname}]"
-            f"[{os.path.basename(self.file)}:{self.lineno} {self.func}]"
-            f"{self.message}"
+            f"[{context.nid:012x} {context.pid:6d} {context.tid:6d}]"
+            f"[{context.nname} {context.pname} {context.tname}]"
+            f"[{site.basename}:{self.lineno} {site.func}]"
+            f"{self.get_message()}"
             "\n"
         )
 
         return text
 
     def __repr__(self) -> str:
-        return json.dumps(self.__dict__, ensure_ascii=False) + "\n"
+        fields = {name: getattr(self, name) for name in record_fields}
+        fields["message"] = self.get_message()
+        return json.dumps(fields, ensure_ascii=False) + "\n"
+
+
+# __repr__ 输出的字段
+record_fields = (
+    "ts",
+    "seq",
+    "level",
+    "nid",
+    "nname",
+    "pid",
+    "pname",
+    "tid",
+    "tname",
+    "file",
+    "lineno",
+    "func",
+    "message",
+)
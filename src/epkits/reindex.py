@@ -0,0 +1,28 @@
+"""为已有的日志重建稀疏索引 ep.0.log.idx
+
+python -m epkits.reindex                  为 ./log 下所有日志重建索引
+python -m epkits.reindex ep.000012.log.gz 为指定文件重建索引
+"""
+
+import argparse
+
+from .index import build_index, read_index
+from .segment import list_logs
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m epkits.reindex", description="重建日志索引")
+    parser.add_argument("files", nargs="*", help="日志文件, 默认为 --dir 下的所有日志")
+    parser.add_argument("--dir", default="./log")
+    parser.add_argument("--prefix", default="ep")
+    parser.add_argument("--every", type=int, default=1024, help="每多少条记录一个条目")
+    parser.add_argument("--size", type=int, default=64 * 1024, help="每多少字节一个条目")
+    args = parser.parse_args()
+
+    for path in args.files or list_logs(args.dir, args.prefix):
+        idx = build_index(path, args.every, args.size)
+        print(f"{path} -> {idx}, {len(read_index(idx))} 条")
+
+
+if __name__ == "__main__":
+    main()
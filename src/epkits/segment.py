@@ -0,0 +1,133 @@
+__all__ = ["list_segments", "list_logs", "open_segment", "index_path", "recover_trailer", "logical_length"]
+
+import os
+import re
+import io
+import mmap
+import shutil
+import gzip
+import lzma
+import bz2
+import struct
+from typing import BinaryIO
+
+# 压缩方式 -> 文件后缀
+compress_suffixes = {
+    "gzip": ".gz",
+    "lzma": ".xz",
+    "bz2": ".bz2",
+}
+
+log_suffixes = ("", *compress_suffixes.values())
+index_suffix = ".idx"
+
+# mmap 模式的文件末尾: magic + 实际长度, 每次写入后更新
+trailer = struct.Struct("<8sQ")
+trailer_magic = b"EPTRAIL\x00"
+
+
+def segment_path(dir: str, prefix: str, segment_id: int) -> str:
+    return os.path.join(dir, f"{prefix}.{segment_id:06d}.log")
+
+
+def list_segments(dir: str, prefix: str) -> list[tuple[int, str]]:
+    """按编号从旧到新列出段文件 ep.000123.log, 包括压缩后的 ep.000123.log.gz"""
+    pattern = re.compile(rf"{re.escape(prefix)}\.(\d{{6,}})\.log(\.gz|\.xz|\.bz2)?")
+    segments = []
+    try:
+        names = os.listdir(dir)
+    except OSError:
+        return []
+    for name in names:
+        m = pattern.fullmatch(name)
+        if m:
+            segments.append((int(m.group(1)), os.path.join(dir, name)))
+    segments.sort()
+    return segments
+
+
+def list_logs(dir: str, prefix: str) -> list[str]:
+    """按时间从旧到新列出所有日志文件, 同时支持 ep.N.log 和段模式"""
+    pattern = re.compile(rf"{re.escape(prefix)}\.(\d{{1,5}})\.log(\.gz|\.xz|\.bz2)?")
+    rotated = []
+    try:
+        names = os.listdir(dir)
+    except OSError:
+        return []
+    for name in names:
+        m = pattern.fullmatch(name)
+        if m:
+            rotated.append((int(m.group(1)), os.path.join(dir, name)))
+    # ep.0.log 最新, 编号越大越旧
+    rotated.sort(reverse=True)
+
+    logs = [path for i, path in rotated]
+    seen = set()
+    for segment_id, path in list_segments(dir, prefix):
+        # 压缩过程中同一段可能短暂地同时存在压缩和未压缩两份
+        if segment_id not in seen:
+            seen.add(segment_id)
+            logs.append(path)
+    return logs
+
+
+def index_path(path: str) -> str:
+    """日志文件对应的索引文件, 压缩前后的日志共用同一个索引"""
+    for suffix in compress_suffixes.values():
+        if path.endswith(suffix):
+            path = path[: -len(suffix)]
+            break
+    return path + index_suffix
+
+
+def open_segment(path: str) -> BinaryIO:
+    """按后缀透明地打开压缩或未压缩的日志文件"""
+    if path.endswith(".gz"):
+        return gzip.open(path, "rb")  # type: ignore[return-value]
+    if path.endswith(".xz"):
+        return lzma.open(path, "rb")  # type: ignore[return-value]
+    if path.endswith(".bz2"):
+        return bz2.open(path, "rb")  # type: ignore[return-value]
+    return open(path, "rb")
+
+
+def compress_file(src: io.BufferedReader, dst: str, method: str, level: int | None) -> None:
+    if method == "gzip":
+        f = gzip.open(dst, "wb", compresslevel=9 if level is None else level)
+    elif method == "lzma":
+        f = lzma.open(dst, "wb", preset=level)
+    elif method == "bz2":
+        f = bz2.open(dst, "wb", compresslevel=9 if level is None else level)
+    else:
+        raise ValueError(f"不支持的压缩方式: {method}")
+
+    with f:
+        shutil.copyfileobj(src, f, 1024 * 1024)
+
+
+def recover_trailer(path: str) -> bool:
+    """mmap 模式写到一半崩溃的文件末尾是预分配的空白和 trailer, 按 trailer 截断到实际长度"""
+    try:
+        with open(path, "r+b") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size < trailer.size:
+                return False
+            f.seek(size - trailer.size)
+            tag, length = trailer.unpack(f.read(trailer.size))
+            if tag != trailer_magic or length > size - trailer.size:
+                return False
+            f.truncate(length)
+            return True
+    except OSError:
+        return False
+
+
+def logical_length(data: bytes | mmap.mmap) -> int:
+    """文件内容的实际长度: mmap 模式正在写或者崩溃的文件末尾是预分配的空白和 trailer, 按 trailer 取长度"""
+    size = len(data)
+    if size < trailer.size:
+        return size
+    tag, length = trailer.unpack_from(data, size - trailer.size)
+    if tag != trailer_magic or length > size - trailer.size:
+        return size
+    return length
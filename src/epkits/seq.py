@@ -0,0 +1,94 @@
+__all__ = ["shared_seq_t"]
+
+import itertools
+import mmap
+import os
+import struct
+import threading
+from typing import Iterator
+
+if os.name == "nt":
+    import msvcrt
+else:
+    import fcntl
+
+# 计数文件只有一个 u64: 已经分配出去的最大序号
+counter = struct.Struct("<Q")
+
+
+class shared_seq_t:
+    """多个进程共用的序号, 可以代替 itertools.count 作为 logger.seq_counter
+
+    计数放在 path 文件的共享映射中, 每次加文件锁取走 block 个序号, 块内的序号在进程内无锁分配.
+    序号在所有进程中唯一, 同一进程内单调递增; 不同进程之间只在块的粒度上有序,
+    block 为 1 时每次都加文件锁, 序号就是全局的分配顺序. 文件保留在磁盘上, 重启后序号继续递增
+    """
+
+    def __init__(self, path: str, block: int = 1024) -> None:
+        self.path = path
+        self.block = block
+        self.open()
+
+        # 当前块: (块内序号的迭代器, 块的结束序号), 迭代器越过结束序号后取下一块
+        self.current: tuple[Iterator[int], int] = (iter(()), 0)
+        self.reserve_lock = threading.Lock()
+
+    def open(self) -> None:
+        self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        with file_lock_t(self.fd):
+            if os.fstat(self.fd).st_size < counter.size:
+                os.ftruncate(self.fd, counter.size)
+        self.map = mmap.mmap(self.fd, counter.size)
+
+    def after_fork(self) -> None:
+        """fork 之后在子进程中调用: 当前块属于父进程; 继承的描述符与父进程共用 flock, 互相不排斥, 重新打开"""
+        self.close()
+        self.open()
+        self.current = (iter(()), 0)
+        self.reserve_lock = threading.Lock()
+
+    def reserve(self, exhausted: Iterator[int]) -> None:
+        with self.reserve_lock:
+            # 其他线程可能已经取了下一块
+            if self.current[0] is exhausted:
+                with file_lock_t(self.fd):
+                    (last,) = counter.unpack_from(self.map)
+                    counter.pack_into(self.map, 0, last + self.block)
+                self.current = (itertools.count(last + 1), last + 1 + self.block)
+
+    def __iter__(self) -> "shared_seq_t":
+        return self
+
+    def __next__(self) -> int:
+        while True:
+            # next() 在 C 层完成, 受 GIL 保护是原子的; 多个线程同时越过块尾时多取的序号作废
+            numbers, end = self.current
+            seq = next(numbers, end)
+            if seq < end:
+                return seq
+            self.reserve(numbers)
+
+    def close(self) -> None:
+        self.map.close()
+        os.close(self.fd)
+
+
+class file_lock_t:
+    """对已打开的文件加互斥锁, 不删除文件"""
+
+    def __init__(self, fd: int) -> None:
+        self.fd = fd
+
+    def __enter__(self) -> None:
+        if os.name == "nt":
+            os.lseek(self.fd, 0, os.SEEK_SET)
+            msvcrt.locking(self.fd, msvcrt.LK_LOCK, 1)
+        else:
+            fcntl.flock(self.fd, fcntl.LOCK_EX)
+
+    def __exit__(self, *exc_info: object) -> None:
+        if os.name == "nt":
+            os.lseek(self.fd, 0, os.SEEK_SET)
+            msvcrt.locking(self.fd, msvcrt.LK_UNLCK, 1)
+        else:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
@@ -0,0 +1,125 @@
+__all__ = ["shm_ring_t"]
+
+import struct
+import zlib
+from multiprocessing import resource_tracker, shared_memory
+
+# 共享内存环形缓冲区, 一个写者一个读者, 不加锁:
+#   偏移 0  写位置 u64, 只由写者修改
+#   偏移 64 读位置 u64, 只由读者修改, 与写位置分开在两个缓存行
+#   偏移 128 开始是数据区, 位置单调递增, 对容量取模得到数据区内的偏移
+# 对齐的 8 字节在 x86 和 arm64 上一次写入, 读者不会读到写了一半的位置.
+# 但 Python 没有内存屏障, arm64 等弱内存序的 CPU 上读者可能先看到新的写位置, 后看到数据.
+# 所以每次写入的数据前有块头: 块的起始位置 u64, 长度 u32, crc32 u32. 读者只取块头中的位置等于读位置,
+# 长度不超过已写入的字节数并且 crc32 一致的块, 不一致说明数据还没有到达 (或者是上一圈的旧数据), 留到下次再读
+position = struct.Struct("<Q")
+chunk_header = struct.Struct("<QII")
+write_offset = 0
+read_offset = 64
+data_offset = 128
+
+
+class shm_ring_t:
+    def __init__(self, shm: shared_memory.SharedMemory, owner: bool) -> None:
+        self.shm = shm
+        # 读者负责删除共享内存, 写者退出后读者还要取完剩余的数据
+        self.owner = owner
+        buf = shm.buf
+        assert buf is not None
+        self.buf: memoryview = buf
+        self.capacity = shm.size - data_offset
+
+    @classmethod
+    def create(cls, capacity: int) -> "shm_ring_t":
+        shm = shared_memory.SharedMemory(create=True, size=data_offset + capacity)
+        ring = cls(shm, False)
+        position.pack_into(ring.buf, write_offset, 0)
+        position.pack_into(ring.buf, read_offset, 0)
+        # 创建和打开都会登记到 resource_tracker, 进程退出时删除共享内存. 由读者负责删除,
+        # 写者在把名字告诉读者之前取消登记; 用 multiprocessing 启动的子进程与父进程共用一个 resource_tracker,
+        # 先取消再由读者登记, 两边的登记不会互相抵消
+        resource_tracker.unregister(shm._name, "shared_memory")  # type: ignore[attr-defined]
+        return ring
+
+    @classmethod
+    def attach(cls, name: str) -> "shm_ring_t":
+        return cls(shared_memory.SharedMemory(name=name), True)
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    def free(self) -> int:
+        written = position.unpack_from(self.buf, write_offset)[0]
+        read = position.unpack_from(self.buf, read_offset)[0]
+        return self.capacity - (written - read)
+
+    def empty(self) -> bool:
+        written = position.unpack_from(self.buf, write_offset)[0]
+        read = position.unpack_from(self.buf, read_offset)[0]
+        return written == read
+
+    def put(self, pos: int, data: bytes) -> None:
+        """复制到数据区, 越过末尾时从头继续"""
+        n = len(data)
+        start = pos % self.capacity
+        first = min(n, self.capacity - start)
+        self.buf[data_offset + start : data_offset + start + first] = data[:first]
+        if first < n:
+            self.buf[data_offset : data_offset + n - first] = data[first:]
+
+    def get(self, pos: int, n: int) -> bytes:
+        start = pos % self.capacity
+        first = min(n, self.capacity - start)
+        data = bytes(self.buf[data_offset + start : data_offset + start + first])
+        if first < n:
+            data += bytes(self.buf[data_offset : data_offset + n - first])
+        return data
+
+    def write(self, data: bytes) -> bool:
+        """写者调用, 空间不够时不写入, 返回 False"""
+        n = chunk_header.size + len(data)
+        written = position.unpack_from(self.buf, write_offset)[0]
+        read = position.unpack_from(self.buf, read_offset)[0]
+        if n > self.capacity - (written - read):
+            return False
+
+        self.put(written, chunk_header.pack(written, len(data), zlib.crc32(data)))
+        self.put(written + chunk_header.size, data)
+        position.pack_into(self.buf, write_offset, written + n)
+        return True
+
+    def read(self) -> bytes:
+        """读者调用, 取出所有已经完整到达的数据"""
+        written = position.unpack_from(self.buf, write_offset)[0]
+        read = position.unpack_from(self.buf, read_offset)[0]
+
+        chunks = []
+        while written - read >= chunk_header.size:
+            pos, n, crc = chunk_header.unpack(self.get(read, chunk_header.size))
+            if pos != read or n > written - read - chunk_header.size:
+                break
+            data = self.get(read + chunk_header.size, n)
+            if zlib.crc32(data) != crc:
+                break
+            chunks.append(data)
+            read += chunk_header.size + n
+
+        if chunks:
+            position.pack_into(self.buf, read_offset, read)
+        return b"".join(chunks)
+
+    def close(self) -> None:
+        # self.buf 就是 shm.buf, 由 shm.close() 释放, 之后不能再访问
+        self.shm.close()
+        if self.owner:
+            try:
+                self.shm.unlink()
+            except OSError:
+                pass
+
+    def discard(self) -> None:
+        """写者在读者打开之前放弃"""
+        resource_tracker.register(self.shm._name, "shared_memory")  # type: ignore[attr-defined]
+        self.owner = True
+        self.close()
@@ -0,0 +1,444 @@
+__all__ = [
+    "sink_t",
+    "file_sink_t",
+    "stream_sink_t",
+    "unix_sink_t",
+    "ring_sink_t",
+    "callable_sink_t",
+    "net_sink_t",
+]
+
+import os
+import sys
+import time
+import queue
+import socket
+import struct
+import threading
+import collections
+from typing import Any, Callable, TextIO
+
+from .level import level_t
+from .record import record_t
+from .binary import binary_encoder_t, decode_records
+
+
+def take_batch(log_queue: queue.Queue, count: int) -> list[Any]:
+    """一次加锁取出最多 count 条记录"""
+    with log_queue.mutex:
+        records = log_queue.queue
+        if len(records) <= count:
+            batch = list(records)
+            records.clear()
+        else:
+            batch = [records.popleft() for i in range(count)]
+        if batch:
+            log_queue.not_full.notify_all()
+    return batch
+
+
+class sink_t:
+    """日志输出端, 每个输出端有自己的有界队列和写线程, 慢的输出端不会拖住其他输出端"""
+
+    def __init__(
+        self,
+        *,
+        level: level_t = level_t.N,
+        formatter: Callable[[record_t], str] = str,
+        maxsize: int = 100 * 1000,
+        name: str = "epsink",
+    ) -> None:
+        """
+        :param level: 低于该级别的记录不进入该输出端
+        :param formatter: 记录转为文本, 默认与日志文件相同
+        :param maxsize: 队列上限, 满了丢弃新记录并计数
+        """
+        self.level = level
+        self.formatter = formatter
+        self.batch_count = 4096
+        self.dropped = 0
+
+        self.queue: queue.Queue[record_t] = queue.Queue(maxsize=maxsize)
+        self.event = threading.Event()
+        self.stopping = False
+        self.thread = threading.Thread(target=self.worker, name=name, daemon=True)
+
+    def after_fork(self) -> None:
+        """fork 之后在子进程中调用, 队列中是父进程的记录, 由父进程输出; 之后调用 start()"""
+        self.queue = queue.Queue(maxsize=self.queue.maxsize)
+        self.event = threading.Event()
+        self.stopping = False
+        self.dropped = 0
+        self.thread = threading.Thread(target=self.worker, name=self.thread.name, daemon=True)
+
+    def start(self) -> None:
+        if not self.thread.is_alive():
+            self.thread.start()
+
+    def stop(self, timeout: float | None = 1) -> None:
+        self.stopping = True
+        self.event.set()
+        if self.thread.is_alive():
+            self.thread.join(timeout)
+
+    def handle(self, record: record_t) -> None:
+        if record.level < self.level:
+            return
+
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            return
+
+        if not self.event.is_set():
+            self.event.set()
+
+    def timeout(self) -> float | None:
+        """没有新记录时写线程最多等多久, None 表示一直等"""
+        return None
+
+    def worker(self) -> None:
+        while True:
+            self.event.wait(self.timeout())
+            self.event.clear()
+
+            records = take_batch(self.queue, self.batch_count)
+            try:
+                if records:
+                    self.emit(records)
+                else:
+                    self.idle()
+            except Exception:
+                # 输出端出错只丢这一批, 不能让写线程退出
+                pass
+
+            if len(records) >= self.batch_count:
+                self.event.set()
+            elif self.stopping:
+                break
+
+        self.close()
+
+    def emit(self, records: list[record_t]) -> None:
+        self.write("".join(map(self.formatter, records)))
+
+    def write(self, text: str) -> None:
+        """输出一批格式化后的文本, 子类覆盖; 默认丢弃, 不按文本输出的子类覆盖 emit() 或 handle()"""
+        pass
+
+    def idle(self) -> None:
+        """timeout() 到期时没有新记录"""
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class file_sink_t(sink_t):
+    """追加写入单个文件, 不轮转"""
+
+    def __init__(self, path: str, **kwargs) -> None:
+        super().__init__(name="epsink.file", **kwargs)
+        self.path = path
+        self.file = None
+
+    def write(self, text: str) -> None:
+        if self.file is None:
+            self.file = open(self.path, "ab", buffering=0)
+        view = memoryview(text.encode())
+        while view:
+            n = self.file.write(view)
+            view = view[n:]
+
+    def close(self) -> None:
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+class stream_sink_t(sink_t):
+    """写入文本流, 默认 stdout"""
+
+    def __init__(self, stream: TextIO | None = None, **kwargs) -> None:
+        super().__init__(name="epsink.stream", **kwargs)
+        self.stream = stream if stream is not None else sys.stdout
+
+    def write(self, text: str) -> None:
+        self.stream.write(text)
+        self.stream.flush()
+
+
+class unix_sink_t(sink_t):
+    """写入 Unix 域套接字 (SOCK_STREAM), 断开后每 retry_interval 秒重连一次, 期间的记录丢弃"""
+
+    def __init__(self, path: str, **kwargs) -> None:
+        super().__init__(name="epsink.unix", **kwargs)
+        self.path = path
+        self.sock: socket.socket | None = None
+        self.retry_interval = 1.0
+        self.retry_time = 0.0
+
+    def after_fork(self) -> None:
+        super().after_fork()
+        # 连接是与父进程共用的, 只关闭子进程的描述符, 子进程自己重连
+        self.close()
+
+    def write(self, text: str) -> None:
+        if self.sock is None:
+            now = time.monotonic()
+            if now < self.retry_time:
+                return
+            self.retry_time = now + self.retry_interval
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                sock.connect(self.path)
+            except OSError:
+                sock.close()
+                return
+            self.sock = sock
+
+        try:
+            self.sock.sendall(text.encode())
+        except OSError:
+            self.close()
+
+    def close(self) -> None:
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+
+class ring_sink_t(sink_t):
+    """内存环形缓冲区, 保留最近 capacity 条记录, 不需要写线程"""
+
+    def __init__(self, capacity: int = 1000, **kwargs) -> None:
+        super().__init__(name="epsink.ring", **kwargs)
+        self.ring: collections.deque[record_t] = collections.deque(maxlen=capacity)
+
+    def start(self) -> None:
+        pass
+
+    def stop(self, timeout: float | None = 1) -> None:
+        pass
+
+    def handle(self, record: record_t) -> None:
+        if record.level < self.level:
+            return
+        self.ring.append(record)
+
+    def lines(self) -> list[str]:
+        return [self.formatter(record) for record in list(self.ring)]
+
+
+class callable_sink_t(sink_t):
+    """在输出端线程中逐条调用 func(record)"""
+
+    def __init__(self, func: Callable[[record_t], Any], **kwargs) -> None:
+        super().__init__(name="epsink.callable", **kwargs)
+        self.func = func
+
+    def emit(self, records: list[record_t]) -> None:
+        for record in records:
+            self.func(record)
+
+
+class net_sink_t(sink_t):
+    """发送到远端的收集器 (python -m epkits.collector), 记录编码为二进制帧, 每批一次发送
+
+    TCP: 连接以 magic 开头, 之后是长度前缀的帧, 与 ep.sock 上的格式相同, 字典按连接维护.
+    UDP: 每个数据报以 magic 开头且自带字典, 可以单独解码, 不超过 datagram_size 字节, 丢包不重传.
+
+    发送失败的记录放进重试缓冲区, 按 backoff_min 到 backoff_max 秒指数退避重连, 连上后先补发.
+    缓冲区超过 retry_max 条时, 设置了 spill_path 就整体写入该文件, 否则丢弃最旧的记录;
+    溢出文件最多 spill_size 字节, 关闭时未发出的记录也写入该文件, 下次连上后补发
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        *,
+        protocol: str = "tcp",
+        spill_path: str | None = None,
+        **kwargs,
+    ) -> None:
+        super().__init__(name="epsink.net", **kwargs)
+        self.address = (host, port)
+        self.protocol = protocol
+        self.sock: socket.socket | None = None
+        self.encoder = binary_encoder_t()
+        self.send_timeout = 5.0
+        self.datagram_size = 60 * 1024
+
+        self.retry: collections.deque[record_t] = collections.deque()
+        self.retry_max = 100 * 1000
+        self.backoff_min = 0.5
+        self.backoff_max = 30.0
+        self.backoff = self.backoff_min
+        self.retry_time = 0.0
+
+        self.spill_path = spill_path
+        self.spill_size = 1024 * 1024 * 64
+        self.spill_encoder = binary_encoder_t()
+
+    def after_fork(self) -> None:
+        super().after_fork()
+        self.retry.clear()
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+        # 溢出文件属于父进程, 两个进程不能同时追加
+        self.spill_path = None
+
+    def timeout(self) -> float | None:
+        if not self.retry and not self.spilled():
+            return None
+        return max(0.0, self.retry_time - time.monotonic())
+
+    def connect(self) -> bool:
+        now = time.monotonic()
+        if now < self.retry_time:
+            return False
+
+        family = socket.AF_INET6 if ":" in self.address[0] else socket.AF_INET
+        kind = socket.SOCK_STREAM if self.protocol == "tcp" else socket.SOCK_DGRAM
+        sock = socket.socket(family, kind)
+        sock.settimeout(self.send_timeout)
+        try:
+            # UDP 也 connect, 对方端口不可达时后续的 send 会报错
+            sock.connect(self.address)
+            if self.protocol == "tcp":
+                sock.sendall(self.encoder.start())
+        except OSError:
+            sock.close()
+            self.retry_time = now + self.backoff
+            self.backoff = min(self.backoff * 2, self.backoff_max)
+            return False
+
+        self.sock = sock
+        self.backoff = self.backoff_min
+        return True
+
+    def disconnect(self) -> None:
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+        self.retry_time = time.monotonic() + self.backoff
+        self.backoff = min(self.backoff * 2, self.backoff_max)
+
+    def send(self, records: list[record_t]) -> bool:
+        assert self.sock is not None
+        try:
+            if self.protocol == "tcp":
+                self.sock.sendall(b"".join(map(self.encoder.encode, records)))
+                return True
+
+            # 每个数据报重新开始字典
+            pieces = [self.encoder.start()]
+            size = len(pieces[0])
+            for record in records:
+                data = self.encoder.encode(record)
+                if size + len(data) > self.datagram_size and len(pieces) > 1:
+                    self.sock.send(b"".join(pieces))
+                    pieces = [self.encoder.start()]
+                    size = len(pieces[0])
+                    data = self.encoder.encode(record)
+                if size + len(data) > self.datagram_size:
+                    # 单条记录超过一个数据报
+                    self.dropped += 1
+                    continue
+                pieces.append(data)
+                size += len(data)
+            if len(pieces) > 1:
+                self.sock.send(b"".join(pieces))
+        except OSError:
+            # TCP 这一批可能已经发出了一部分, 重发时收集器会收到重复的记录
+            self.disconnect()
+            return False
+        return True
+
+    def spilled(self) -> bool:
+        return self.spill_path is not None and os.path.exists(self.spill_path)
+
+    def spill(self, records: list[record_t] | collections.deque[record_t]) -> None:
+        assert self.spill_path is not None
+        try:
+            size = os.path.getsize(self.spill_path)
+        except OSError:
+            size = 0
+        if size >= self.spill_size:
+            self.dropped += len(records)
+            return
+
+        if size == 0:
+            chunks = [self.spill_encoder.start()]
+        else:
+            chunks = []
+        chunks.extend(map(self.spill_encoder.encode, records))
+        with open(self.spill_path, "ab") as f:
+            f.write(b"".join(chunks))
+
+    def unspill(self) -> bool:
+        """补发溢出文件中的记录, 全部发出后删除文件"""
+        assert self.spill_path is not None
+        with open(self.spill_path, "rb") as f:
+            data = f.read()
+        try:
+            records = [record for offset, record in decode_records(data)]
+        except (KeyError, ValueError, struct.error):
+            # 文件损坏, 放弃其中的记录, 否则每次重连都会失败
+            records = []
+        for i in range(0, len(records), self.batch_count):
+            if not self.send(records[i : i + self.batch_count]):
+                # 文件保持不变, 下次从头补发
+                return False
+        os.remove(self.spill_path)
+        # 下次溢出时重新写文件头
+        self.spill_encoder = binary_encoder_t()
+        return True
+
+    def defer(self, records: list[record_t]) -> None:
+        self.retry.extend(records)
+        if len(self.retry) <= self.retry_max:
+            return
+        if self.spill_path is not None:
+            self.spill(self.retry)
+            self.retry.clear()
+            return
+        while len(self.retry) > self.retry_max:
+            self.retry.popleft()
+            self.dropped += 1
+
+    def flush_retry(self) -> bool:
+        """按顺序补发: 溢出文件中的记录最旧, 然后是重试缓冲区"""
+        if self.spilled() and not self.unspill():
+            return False
+        while self.retry:
+            records = [self.retry.popleft() for i in range(min(len(self.retry), self.batch_count))]
+            if not self.send(records):
+                self.retry.extendleft(reversed(records))
+                return False
+        return True
+
+    def emit(self, records: list[record_t]) -> None:
+        if self.sock is None and not self.connect():
+            self.defer(records)
+            return
+        if not self.flush_retry() or not self.send(records):
+            self.defer(records)
+
+    def idle(self) -> None:
+        if (self.retry or self.spilled()) and (self.sock is not None or self.connect()):
+            self.flush_retry()
+
+    def close(self) -> None:
+        # 退出时不再等待重连
+        if self.retry and self.sock is not None:
+            self.flush_retry()
+        if self.retry and self.spill_path is not None:
+            self.spill(self.retry)
+        self.retry.clear()
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
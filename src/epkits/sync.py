@@ -0,0 +1,9 @@
+__all__ = ["sync_t"]
+
+from enum import IntEnum
+
+
+class sync_t(IntEnum):
+    NONE = 0  # 运行中不主动落盘, 只在轮转和退出时 fsync
+    INTERVAL = 1  # 有未落盘的数据时每 sync_ms 毫秒 fdatasync 一次, 同一窗口内的写入合并
+    LEVEL = 2  # 一批记录中有级别不低于 sync_level 的记录时立即写入并 fdatasync
@@ -6,9 +6,6 @@ __all__ = ["reg_process_events_handle", "skip", "testsuit_base_t", "run_all_test
 '''
 
 import time
-import os
-import multiprocessing
-import threading
 import random
 import inspect
 import pathlib
@@ -23,7 +20,8 @@ from .core import exception_t
 from .level import level_t
 from .record import record_t
 from .logger import logger
-from .zero import get_frame
+from .context import get_context
+from .callsite import get_callsite
 
 test_summary = {
     "all": {
@@ -249,28 +247,7 @@ class check_passed_t(check_base_t):
     ) -> bool | None:
         process_events()
 
-        frame = get_frame(1)
-
-        record = record_t(
-            ts=time.time(),
-            seq=logger.get_seq(level_t.T),
-            level=level_t.T,
-            nid=logger.get_nid(),
-            nname=logger.get_nname(),
-            pid=os.getpid(),
-            pname=multiprocessing.current_process().name,
-            tid=threading.get_ident(),
-            tname=threading.current_thread().name,
-            file="",
-            lineno=0,
-            func="",
-            message="",
-        )
-
-        if frame:
-            record.file = pathlib.PurePath(frame.f_code.co_filename).as_posix()
-            record.lineno = frame.f_lineno
-            record.func = frame.f_code.co_qualname
+        record = logger.make_record(level_t.T, logger.get_seq(level_t.T), back=1)
 
         self.err = 0
         if exc_type:
@@ -282,7 +259,7 @@ class check_passed_t(check_base_t):
         else:
             record.message = f"核对通过: 期待返回 = Any, 实际返回 = {self.ret}"
 
-        logger.rawlog(**record.__dict__)
+        logger.emit(record)
 
         if self.err:
             raise check_err()
@@ -307,28 +284,7 @@ class check_failed_t(check_base_t):
     ) -> bool | None:
         process_events()
 
-        frame = get_frame(1)
-
-        record = record_t(
-            ts=time.time(),
-            seq=logger.get_seq(level_t.T),
-            level=level_t.T,
-            nid=logger.get_nid(),
-            nname=logger.get_nname(),
-            pid=os.getpid(),
-            pname=multiprocessing.current_process().name,
-            tid=threading.get_ident(),
-            tname=threading.current_thread().name,
-            file="",
-            lineno=0,
-            func="",
-            message="",
-        )
-
-        if frame:
-            record.file = pathlib.PurePath(frame.f_code.co_filename).as_posix()
-            record.lineno = frame.f_lineno
-            record.func = frame.f_code.co_qualname
+        record = logger.make_record(level_t.T, logger.get_seq(level_t.T), back=1)
 
         self.err = 1
         if exc_type:
@@ -340,7 +296,7 @@ class check_failed_t(check_base_t):
         else:
             record.message = f"核对失败: 期待返回 != Any, 实际返回 = {self.ret}"
 
-        logger.rawlog(**record.__dict__)
+        logger.emit(record)
 
         if self.err:
             raise check_err()
@@ -367,28 +323,7 @@ class check_true_t(check_base_t):
     ) -> bool | None:
         process_events()
 
-        frame = get_frame(1)
-
-        record = record_t(
-            ts=time.time(),
-            seq=logger.get_seq(level_t.T),
-            level=level_t.T,
-            nid=logger.get_nid(),
-            nname=logger.get_nname(),
-            pid=os.getpid(),
-            pname=multiprocessing.current_process().name,
-            tid=threading.get_ident(),
-            tname=threading.current_thread().name,
-            file="",
-            lineno=0,
-            func="",
-            message="",
-        )
-
-        if frame:
-            record.file = pathlib.PurePath(frame.f_code.co_filename).as_posix()
-            record.lineno = frame.f_lineno
-            record.func = frame.f_code.co_qualname
+        record = logger.make_record(level_t.T, logger.get_seq(level_t.T), back=1)
 
         if exc_type:
             if exc_traceback:
@@ -404,7 +339,7 @@ class check_true_t(check_base_t):
             self.err = 1
             record.message = f"核对失败: 期待返回 = {self.exp_ret}, 实际返回 = {self.ret}"
 
-        logger.rawlog(**record.__dict__)
+        logger.emit(record)
 
         if self.err:
             raise check_err()
@@ -431,28 +366,7 @@ class check_false_t(check_base_t):
     ) -> bool | None:
         process_events()
 
-        frame = get_frame(1)
-
-        record = record_t(
-            ts=time.time(),
-            seq=logger.get_seq(level_t.T),
-            level=level_t.T,
-            nid=logger.get_nid(),
-            nname=logger.get_nname(),
-            pid=os.getpid(),
-            pname=multiprocessing.current_process().name,
-            tid=threading.get_ident(),
-            tname=threading.current_thread().name,
-            file="",
-            lineno=0,
-            func="",
-            message="",
-        )
-
-        if frame:
-            record.file = pathlib.PurePath(frame.f_code.co_filename).as_posix()
-            record.lineno = frame.f_lineno
-            record.func = frame.f_code.co_qualname
+        record = logger.make_record(level_t.T, logger.get_seq(level_t.T), back=1)
 
         if exc_type:
             if exc_traceback:
@@ -468,7 +382,7 @@ class check_false_t(check_base_t):
             self.err = 1
             record.message = f"核对失败: 期待返回 = {self.exp_ret}, 实际返回 = {self.ret}"
 
-        logger.rawlog(**record.__dict__)
+        logger.emit(record)
 
         if self.err:
             raise check_err()
@@ -495,28 +409,7 @@ class check_eq_t(check_base_t):
     ) -> bool | None:
         process_events()
 
-        frame = get_frame(1)
-
-        record = record_t(
-            ts=time.time(),
-            seq=logger.get_seq(level_t.T),
-            level=level_t.T,
-            nid=logger.get_nid(),
-            nname=logger.get_nname(),
-            pid=os.getpid(),
-            pname=multiprocessing.current_process().name,
-            tid=threading.get_ident(),
-            tname=threading.current_thread().name,
-            file="",
-            lineno=0,
-            func="",
-            message="",
-        )
-
-        if frame:
-            record.file = pathlib.PurePath(frame.f_code.co_filename).as_posix()
-            record.lineno = frame.f_lineno
-            record.func = frame.f_code.co_qualname
+        record = logger.make_record(level_t.T, logger.get_seq(level_t.T), back=1)
 
         if exc_type:
             if exc_traceback:
@@ -532,7 +425,7 @@ class check_eq_t(check_base_t):
             self.err = 1
             record.message = f"核对失败: 期待返回 = {self.exp_ret}, 实际返回 = {self.ret}"
 
-        logger.rawlog(**record.__dict__)
+        logger.emit(record)
 
         if self.err:
             raise check_err()
@@ -559,28 +452,7 @@ class check_ne_t(check_base_t):
     ) -> bool | None:
         process_events()
 
-        frame = get_frame(1)
-
-        record = record_t(
-            ts=time.time(),
-            seq=logger.get_seq(level_t.T),
-            level=level_t.T,
-            nid=logger.get_nid(),
-            nname=logger.get_nname(),
-            pid=os.getpid(),
-            pname=multiprocessing.current_process().name,
-            tid=threading.get_ident(),
-            tname=threading.current_thread().name,
-            file="",
-            lineno=0,
-            func="",
-            message="",
-        )
-
-        if frame:
-            record.file = pathlib.PurePath(frame.f_code.co_filename).as_posix()
-            record.lineno = frame.f_lineno
-            record.func = frame.f_code.co_qualname
+        record = logger.make_record(level_t.T, logger.get_seq(level_t.T), back=1)
 
         if exc_type:
             if exc_traceback:
@@ -596,7 +468,7 @@ class check_ne_t(check_base_t):
             self.err = 1
             record.message = f"核对失败: 期待返回 != {self.exp_ret}, 实际返回 = {self.ret}"
 
-        logger.rawlog(**record.__dict__)
+        logger.emit(record)
 
         if self.err:
             raise check_err()
@@ -623,28 +495,7 @@ class check_lt_t(check_base_t):
     ) -> bool | None:
         process_events()
 
-        frame = get_frame(1)
-
-        record = record_t(
-            ts=time.time(),
-            seq=logger.get_seq(level_t.T),
-            level=level_t.T,
-            nid=logger.get_nid(),
-            nname=logger.get_nname(),
-            pid=os.getpid(),
-            pname=multiprocessing.current_process().name,
-            tid=threading.get_ident(),
-            tname=threading.current_thread().name,
-            file="",
-            lineno=0,
-            func="",
-            message="",
-        )
-
-        if frame:
-            record.file = pathlib.PurePath(frame.f_code.co_filename).as_posix()
-            record.lineno = frame.f_lineno
-            record.func = frame.f_code.co_qualname
+        record = logger.make_record(level_t.T, logger.get_seq(level_t.T), back=1)
 
         if exc_type:
             if exc_traceback:
@@ -660,7 +511,7 @@ class check_lt_t(check_base_t):
             self.err = 1
             record.message = f"核对失败: 期待返回 < {self.exp_ret}, 实际返回 = {self.ret}"
 
-        logger.rawlog(**record.__dict__)
+        logger.emit(record)
 
         if self.err:
             raise check_err()
@@ -687,28 +538,7 @@ class check_le_t(check_base_t):
     ) -> bool | None:
         process_events()
 
-        frame = get_frame(1)
-
-        record = record_t(
-            ts=time.time(),
-            seq=logger.get_seq(level_t.T),
-            level=level_t.T,
-            nid=logger.get_nid(),
-            nname=logger.get_nname(),
-            pid=os.getpid(),
-            pname=multiprocessing.current_process().name,
-            tid=threading.get_ident(),
-            tname=threading.current_thread().name,
-            file="",
-            lineno=0,
-            func="",
-            message="",
-        )
-
-        if frame:
-            record.file = pathlib.PurePath(frame.f_code.co_filename).as_posix()
-            record.lineno = frame.f_lineno
-            record.func = frame.f_code.co_qualname
+        record = logger.make_record(level_t.T, logger.get_seq(level_t.T), back=1)
 
         if exc_type:
             if exc_traceback:
@@ -724,7 +554,7 @@ class check_le_t(check_base_t):
             self.err = 1
             record.message = f"核对失败: 期待返回 <= {self.exp_ret}, 实际返回 = {self.ret}"
 
-        logger.rawlog(**record.__dict__)
+        logger.emit(record)
 
         if self.err:
             raise check_err()
@@ -751,28 +581,7 @@ class check_gt_t(check_base_t):
     ) -> bool | None:
         process_events()
 
-        frame = get_frame(1)
-
-        record = record_t(
-            ts=time.time(),
-            seq=logger.get_seq(level_t.T),
-            level=level_t.T,
-            nid=logger.get_nid(),
-            nname=logger.get_nname(),
-            pid=os.getpid(),
-            pname=multiprocessing.current_process().name,
-            tid=threading.get_ident(),
-            tname=threading.current_thread().name,
-            file="",
-            lineno=0,
-            func="",
-            message="",
-        )
-
-        if frame:
-            record.file = pathlib.PurePath(frame.f_code.co_filename).as_posix()
-            record.lineno = frame.f_lineno
-            record.func = frame.f_code.co_qualname
+        record = logger.make_record(level_t.T, logger.get_seq(level_t.T), back=1)
 
         if exc_type:
             if exc_traceback:
@@ -788,7 +597,7 @@ class check_gt_t(check_base_t):
             self.err = 1
             record.message = f"核对失败: 期待返回 > {self.exp_ret}, 实际返回 = {self.ret}"
 
-        logger.rawlog(**record.__dict__)
+        logger.emit(record)
 
         if self.err:
             raise check_err()
@@ -815,28 +624,7 @@ class check_ge_t(check_base_t):
     ) -> bool | None:
         process_events()
 
-        frame = get_frame(1)
-
-        record = record_t(
-            ts=time.time(),
-            seq=logger.get_seq(level_t.T),
-            level=level_t.T,
-            nid=logger.get_nid(),
-            nname=logger.get_nname(),
-            pid=os.getpid(),
-            pname=multiprocessing.current_process().name,
-            tid=threading.get_ident(),
-            tname=threading.current_thread().name,
-            file="",
-            lineno=0,
-            func="",
-            message="",
-        )
-
-        if frame:
-            record.file = pathlib.PurePath(frame.f_code.co_filename).as_posix()
-            record.lineno = frame.f_lineno
-            record.func = frame.f_code.co_qualname
+        record = logger.make_record(level_t.T, logger.get_seq(level_t.T), back=1)
 
         if exc_type:
             if exc_traceback:
@@ -852,7 +640,7 @@ class check_ge_t(check_base_t):
             self.err = 1
             record.message = f"核对失败: 期待返回 >= {self.exp_ret}, 实际返回 = {self.ret}"
 
-        logger.rawlog(**record.__dict__)
+        logger.emit(record)
 
         if self.err:
             raise check_err()
@@ -879,28 +667,7 @@ class check_is_t(check_base_t):
     ) -> bool | None:
         process_events()
 
-        frame = get_frame(1)
-
-        record = record_t(
-            ts=time.time(),
-            seq=logger.get_seq(level_t.T),
-            level=level_t.T,
-            nid=logger.get_nid(),
-            nname=logger.get_nname(),
-            pid=os.getpid(),
-            pname=multiprocessing.current_process().name,
-            tid=threading.get_ident(),
-            tname=threading.current_thread().name,
-            file="",
-            lineno=0,
-            func="",
-            message="",
-        )
-
-        if frame:
-            record.file = pathlib.PurePath(frame.f_code.co_filename).as_posix()
-            record.lineno = frame.f_lineno
-            record.func = frame.f_code.co_qualname
+        record = logger.make_record(level_t.T, logger.get_seq(level_t.T), back=1)
 
         if exc_type:
             if exc_traceback:
@@ -916,7 +683,7 @@ class check_is_t(check_base_t):
             self.err = 1
             record.message = f"核对失败: 期待返回 is {self.exp_ret}, 实际返回 = {self.ret}"
 
-        logger.rawlog(**record.__dict__)
+        logger.emit(record)
 
         if self.err:
             raise check_err()
@@ -943,28 +710,7 @@ class check_not_is_t(check_base_t):
     ) -> bool | None:
         process_events()
 
-        frame = get_frame(1)
-
-        record = record_t(
-            ts=time.time(),
-            seq=logger.get_seq(level_t.T),
-            level=level_t.T,
-            nid=logger.get_nid(),
-            nname=logger.get_nname(),
-            pid=os.getpid(),
-            pname=multiprocessing.current_process().name,
-            tid=threading.get_ident(),
-            tname=threading.current_thread().name,
-            file="",
-            lineno=0,
-            func="",
-            message="",
-        )
-
-        if frame:
-            record.file = pathlib.PurePath(frame.f_code.co_filename).as_posix()
-            record.lineno = frame.f_lineno
-            record.func = frame.f_code.co_qualname
+        record = logger.make_record(level_t.T, logger.get_seq(level_t.T), back=1)
 
         if exc_type:
             if exc_traceback:
@@ -980,7 +726,7 @@ class check_not_is_t(check_base_t):
             self.err = 1
             record.message = f"核对失败: 期待返回 not is {self.exp_ret}, 实际返回 = {self.ret}"
 
-        logger.rawlog(**record.__dict__)
+        logger.emit(record)
 
         if self.err:
             raise check_err()
@@ -1007,28 +753,7 @@ class check_in_t(check_base_t):
     ) -> bool | None:
         process_events()
 
-        frame = get_frame(1)
-
-        record = record_t(
-            ts=time.time(),
-            seq=logger.get_seq(level_t.T),
-            level=level_t.T,
-            nid=logger.get_nid(),
-            nname=logger.get_nname(),
-            pid=os.getpid(),
-            pname=multiprocessing.current_process().name,
-            tid=threading.get_ident(),
-            tname=threading.current_thread().name,
-            file="",
-            lineno=0,
-            func="",
-            message="",
-        )
-
-        if frame:
-            record.file = pathlib.PurePath(frame.f_code.co_filename).as_posix()
-            record.lineno = frame.f_lineno
-            record.func = frame.f_code.co_qualname
+        record = logger.make_record(level_t.T, logger.get_seq(level_t.T), back=1)
 
         if exc_type:
             if exc_traceback:
@@ -1044,7 +769,7 @@ class check_in_t(check_base_t):
             self.err = 1
             record.message = f"核对失败: 期待返回 in {self.exp_ret}, 实际返回 = {self.ret}"
 
-        logger.rawlog(**record.__dict__)
+        logger.emit(record)
 
         if self.err:
             raise check_err()
@@ -1071,28 +796,7 @@ class check_not_in_t(check_base_t):
     ) -> bool | None:
         process_events()
 
-        frame = get_frame(1)
-
-        record = record_t(
-            ts=time.time(),
-            seq=logger.get_seq(level_t.T),
-            level=level_t.T,
-            nid=logger.get_nid(),
-            nname=logger.get_nname(),
-            pid=os.getpid(),
-            pname=multiprocessing.current_process().name,
-            tid=threading.get_ident(),
-            tname=threading.current_thread().name,
-            file="",
-            lineno=0,
-            func="",
-            message="",
-        )
-
-        if frame:
-            record.file = pathlib.PurePath(frame.f_code.co_filename).as_posix()
-            record.lineno = frame.f_lineno
-            record.func = frame.f_code.co_qualname
+        record = logger.make_record(level_t.T, logger.get_seq(level_t.T), back=1)
 
         if exc_type:
             if exc_traceback:
@@ -1108,7 +812,7 @@ class check_not_in_t(check_base_t):
             self.err = 1
             record.message = f"核对失败: 期待返回 not in {self.exp_ret}, 实际返回 = {self.ret}"
 
-        logger.rawlog(**record.__dict__)
+        logger.emit(record)
 
         if self.err:
             raise check_err()
@@ -1135,28 +839,7 @@ class check_isinstance_t(check_base_t):
     ) -> bool | None:
         process_events()
 
-        frame = get_frame(1)
-
-        record = record_t(
-            ts=time.time(),
-            seq=logger.get_seq(level_t.T),
-            level=level_t.T,
-            nid=logger.get_nid(),
-            nname=logger.get_nname(),
-            pid=os.getpid(),
-            pname=multiprocessing.current_process().name,
-            tid=threading.get_ident(),
-            tname=threading.current_thread().name,
-            file="",
-            lineno=0,
-            func="",
-            message="",
-        )
-
-        if frame:
-            record.file = pathlib.PurePath(frame.f_code.co_filename).as_posix()
-            record.lineno = frame.f_lineno
-            record.func = frame.f_code.co_qualname
+        record = logger.make_record(level_t.T, logger.get_seq(level_t.T), back=1)
 
         if exc_type:
             if exc_traceback:
@@ -1172,7 +855,7 @@ class check_isinstance_t(check_base_t):
             self.err = 1
             record.message = f"核对失败: 期待返回 = {self.exp_ret}, 实际返回 = {self.ret}"
 
-        logger.rawlog(**record.__dict__)
+        logger.emit(record)
 
         if self.err:
             raise check_err()
@@ -1198,28 +881,7 @@ class check_not_isinstance_t(check_base_t):
     ) -> bool | None:
         process_events()
 
-        frame = get_frame(1)
-
-        record = record_t(
-            ts=time.time(),
-            seq=logger.get_seq(level_t.T),
-            level=level_t.T,
-            nid=logger.get_nid(),
-            nname=logger.get_nname(),
-            pid=os.getpid(),
-            pname=multiprocessing.current_process().name,
-            tid=threading.get_ident(),
-            tname=threading.current_thread().name,
-            file="",
-            lineno=0,
-            func="",
-            message="",
-        )
-
-        if frame:
-            record.file = pathlib.PurePath(frame.f_code.co_filename).as_posix()
-            record.lineno = frame.f_lineno
-            record.func = frame.f_code.co_qualname
+        record = logger.make_record(level_t.T, logger.get_seq(level_t.T), back=1)
 
         if exc_type:
             if exc_traceback:
@@ -1235,7 +897,7 @@ class check_not_isinstance_t(check_base_t):
             self.err = 0
             record.message = f"核对失败: 期待返回 != {self.exp_ret}, 实际返回 = {self.ret}"
 
-        logger.rawlog(**record.__dict__)
+        logger.emit(record)
 
         if self.err:
             raise check_err()
@@ -1262,28 +924,7 @@ class check_exc_t(check_base_t):
     ) -> bool | None:
         process_events()
 
-        frame = get_frame(1)
-
-        record = record_t(
-            ts=time.time(),
-            seq=logger.get_seq(level_t.T),
-            level=level_t.T,
-            nid=logger.get_nid(),
-            nname=logger.get_nname(),
-            pid=os.getpid(),
-            pname=multiprocessing.current_process().name,
-            tid=threading.get_ident(),
-            tname=threading.current_thread().name,
-            file="",
-            lineno=0,
-            func="",
-            message="",
-        )
-
-        if frame:
-            record.file = pathlib.PurePath(frame.f_code.co_filename).as_posix()
-            record.lineno = frame.f_lineno
-            record.func = frame.f_code.co_qualname
+        record = logger.make_record(level_t.T, logger.get_seq(level_t.T), back=1)
 
         if exc_type:
             if exc_traceback:
@@ -1301,7 +942,7 @@ class check_exc_t(check_base_t):
             self.err = 1
             record.message = f"核对失败: 期待异常 = {self.exp_ret}, 实际异常 = None"
 
-        logger.rawlog(**record.__dict__)
+        logger.emit(record)
 
         if self.err:
             raise check_err()
@@ -1328,28 +969,7 @@ class check_not_exc_t(check_base_t):
     ) -> bool | None:
         process_events()
 
-        frame = get_frame(1)
-
-        record = record_t(
-            ts=time.time(),
-            seq=logger.get_seq(level_t.T),
-            level=level_t.T,
-            nid=logger.get_nid(),
-            nname=logger.get_nname(),
-            pid=os.getpid(),
-            pname=multiprocessing.current_process().name,
-            tid=threading.get_ident(),
-            tname=threading.current_thread().name,
-            file="",
-            lineno=0,
-            func="",
-            message="",
-        )
-
-        if frame:
-            record.file = pathlib.PurePath(frame.f_code.co_filename).as_posix()
-            record.lineno = frame.f_lineno
-            record.func = frame.f_code.co_qualname
+        record = logger.make_record(level_t.T, logger.get_seq(level_t.T), back=1)
 
         if exc_type:
             if exc_traceback:
@@ -1367,7 +987,7 @@ class check_not_exc_t(check_base_t):
             self.err = 0
             record.message = f"核对失败: 期待异常 != {self.exp_ret}, 实际异常 = None"
 
-        logger.rawlog(**record.__dict__)
+        logger.emit(record)
 
         if self.err:
             raise check_err()
@@ -1431,62 +1051,44 @@ def run_all_tests() -> int:
         ):
             testcase_detail["status"] = "skiped"
             test_summary["all"]["skiped"] += 1
-            logger.rawlog(
-                **record_t(
+            logger.emit(
+                record_t(
                     ts=time.time(),
                     seq=logger.get_seq(level_t.T),
                     level=level_t.T,
-                    nid=logger.get_nid(),
-                    nname=logger.get_nname(),
-                    pid=os.getpid(),
-                    pname=multiprocessing.current_process().name,
-                    tid=threading.get_ident(),
-                    tname=threading.current_thread().name,
-                    file=pathlib.PurePath(inspect.getfile(testcase.testmethod)).as_posix(),
+                    context=get_context(),
+                    site=get_callsite(testcase.testmethod.__code__),
                     lineno=inspect.getsourcelines(testcase.testmethod)[1],
-                    func=testcase.testmethod.__qualname__,
                     message=f"测试用例 跳过: {order:6d} {testcase}",
-                ).__dict__
+                )
             )
         else:
-            logger.rawlog(
-                **record_t(
+            logger.emit(
+                record_t(
                     ts=time.time(),
                     seq=logger.get_seq(level_t.T),
                     level=level_t.T,
-                    nid=logger.get_nid(),
-                    nname=logger.get_nname(),
-                    pid=os.getpid(),
-                    pname=multiprocessing.current_process().name,
-                    tid=threading.get_ident(),
-                    tname=threading.current_thread().name,
-                    file=pathlib.PurePath(inspect.getfile(testcase.testmethod)).as_posix(),
+                    context=get_context(),
+                    site=get_callsite(testcase.testmethod.__code__),
                     lineno=inspect.getsourcelines(testcase.testmethod)[1],
-                    func=testcase.testmethod.__qualname__,
                     message=f"测试用例 开始",
-                ).__dict__
+                )
             )
 
             try:
                 process_events()
                 env_up_ret = testcase.env_up()
                 if env_up_ret:
-                    logger.rawlog(
-                        **record_t(
+                    logger.emit(
+                        record_t(
                             ts=time.time(),
                             seq=logger.get_seq(level_t.T),
                             level=level_t.T,
-                            nid=logger.get_nid(),
-                            nname=logger.get_nname(),
-                            pid=os.getpid(),
-                            pname=multiprocessing.current_process().name,
-                            tid=threading.get_ident(),
-                            tname=threading.current_thread().name,
-                            file=pathlib.PurePath(inspect.getfile(testcase.testmethod)).as_posix(),
+                            context=get_context(),
+                            site=get_callsite(testcase.testmethod.__code__),
                             lineno=inspect.getsourcelines(testcase.testmethod)[1],
-                            func=testcase.testmethod.__qualname__,
                             message=f"环境初始化失败 env_up() = {env_up_ret}",
-                        ).__dict__
+                        )
                     )
                     raise test_exception_t()
 
@@ -1496,63 +1098,45 @@ def run_all_tests() -> int:
                 process_events()
                 env_down_ret = testcase.env_down()
                 if env_down_ret:
-                    logger.rawlog(
-                        **record_t(
+                    logger.emit(
+                        record_t(
                             ts=time.time(),
                             seq=logger.get_seq(level_t.T),
                             level=level_t.T,
-                            nid=logger.get_nid(),
-                            nname=logger.get_nname(),
-                            pid=os.getpid(),
-                            pname=multiprocessing.current_process().name,
-                            tid=threading.get_ident(),
-                            tname=threading.current_thread().name,
-                            file=pathlib.PurePath(inspect.getfile(testcase.testmethod)).as_posix(),
+                            context=get_context(),
+                            site=get_callsite(testcase.testmethod.__code__),
                             lineno=inspect.getsourcelines(testcase.testmethod)[1],
-                            func=testcase.testmethod.__qualname__,
                             message=f"环境销毁失败 env_down() = {env_down_ret}",
-                        ).__dict__
+                        )
                     )
                     raise test_exception_t()
 
                 testcase_detail["status"] = "passed"
                 test_summary["all"]["passed"] += 1
-                logger.rawlog(
-                    **record_t(
+                logger.emit(
+                    record_t(
                         ts=time.time(),
                         seq=logger.get_seq(level_t.T),
                         level=level_t.T,
-                        nid=logger.get_nid(),
-                        nname=logger.get_nname(),
-                        pid=os.getpid(),
-                        pname=multiprocessing.current_process().name,
-                        tid=threading.get_ident(),
-                        tname=threading.current_thread().name,
-                        file=pathlib.PurePath(inspect.getfile(testcase.testmethod)).as_posix(),
+                        context=get_context(),
+                        site=get_callsite(testcase.testmethod.__code__),
                         lineno=inspect.getsourcelines(testcase.testmethod)[1],
-                        func=testcase.testmethod.__qualname__,
                         message=f"测试用例 通过: {order:6d} {testcase}",
-                    ).__dict__
+                    )
                 )
             except Exception as e:
                 testcase_detail["status"] = "failed"
                 test_summary["all"]["failed"] += 1
-                logger.rawlog(
-                    **record_t(
+                logger.emit(
+                    record_t(
                         ts=time.time(),
                         seq=logger.get_seq(level_t.T),
                         level=level_t.T,
-                        nid=logger.get_nid(),
-                        nname=logger.get_nname(),
-                        pid=os.getpid(),
-                        pname=multiprocessing.current_process().name,
-                        tid=threading.get_ident(),
-                        tname=threading.current_thread().name,
-                        file=pathlib.PurePath(inspect.getfile(testcase.testmethod)).as_posix(),
+                        context=get_context(),
+                        site=get_callsite(testcase.testmethod.__code__),
                         lineno=inspect.getsourcelines(testcase.testmethod)[1],
-                        func=testcase.testmethod.__qualname__,
                         message=f"测试用例 失败: {order:6d} {testcase}",
-                    ).__dict__
+                    )
                 )
             finally:
                 process_events()
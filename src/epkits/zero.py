@@ -1,17 +1,13 @@
 __all__ = ["get_frame"]
 
-import inspect
+import sys
 import types
 import time
 
 
 def get_frame(back: int = 0) -> types.FrameType | None:
-    frame = inspect.currentframe()
-    for i in range(back + 1):
-        if frame is not None and frame.f_back is not None:
-            frame = frame.f_back
-        else:
-            frame = None
-            break
-
-    return frame
+    """返回调用者向上 back 层的栈帧, back = 0 表示调用 get_frame 的函数"""
+    try:
+        return sys._getframe(back + 1)
+    except ValueError:
+        return None